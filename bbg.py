@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 import os
+import sys
+import time
 import shutil as su
 import json
+import tempfile
+
+import click as ck
 
 from engine.postman import generate_postman_collection, generate_postman_test_collection
 from engine.routes import generate_routes
@@ -9,53 +14,195 @@ from engine.structure import create_directories, mirror_existing_files
 from engine.swagger import generate_yaml_files
 from engine.translation import generate_translations
 from engine.models import generate_models
-from engine import OUTPUT_DIR
-from config.specification import endpoints
+from engine.cache import load_inputs
+from engine.manifest import Manifest, manifest_path
+from engine.scheduler import Stage, run_stage, run_stages
+from engine.metrics import total
+from engine.profiling import merge_profiles, stage_report, write_trace
+from engine import INPUT_DIR, OUTPUT_DIR, vfs, watch
 from config.structure import project_structure
 
 
-# Main function to generate the project
-def generate_flask_project(project_name):
-    # Create project directories and files
-    base_path = os.path.join(os.getcwd(), OUTPUT_DIR, project_name)
-
-    if os.path.exists(base_path):
-        su.rmtree(base_path)
-
-    os.makedirs(base_path, exist_ok=True)
-
-    create_directories(base_path, project_structure)
+def build_structure(base_path, keep_existing=False):
+    create_directories(base_path, project_structure, keep_existing)
 
     # create_test_directories(os.path.join(base_path, "tests"), "", project_structure)
 
+
+def build_routes(base_path, spec, manifest):
     # Generate dynamic code for routes
-    generate_routes(base_path, endpoints)
+    generate_routes(base_path, spec, manifest)
+    return manifest
 
-    relational_models = json.load(
-        open(os.path.join("config", project_name + ".erdplus"), "+br")
-    )
 
-    generate_models(project_name, relational_models)
+def build_models(project_name, graph, manifest, table_ids=None, init_file=True):
+    generate_models(project_name, graph, manifest, table_ids, init_file)
+    return manifest
 
-    generate_yaml_files(base_path, endpoints)
 
-    mirror_existing_files(project_name)
+def build_docs(base_path, spec, manifest):
+    generate_yaml_files(base_path, spec, manifest)
+    return manifest
 
-    generate_translations(project_name)
 
-    os.system(f"black -q {os.path.join(OUTPUT_DIR, project_name)}")
+def export_postman_collection(project_name, spec):
+    generate_postman_collection(project_name, spec)
 
-    generate_postman_collection(project_name, endpoints)
 
+def export_postman_tests(project_name):
     tests = json.load(open(os.path.join("config", project_name + "_tests.json"), "+br"))
 
     generate_postman_test_collection(project_name, tests)
 
+
+# tables per models stage, larger schemas get their models emitted by several workers
+MODELS_PER_STAGE = 200
+# configuration read back as data by engine.cache, keyed in its cache, editing it only needs a regeneration
+DATA_INPUTS = ("specification.py", "indexes.py", "loaders.py")
+# the generator's own sources, imported once by a process
+GENERATOR_DIRS = ("engine", "utils")
+
+
+# Main function to generate the project
+def generate_flask_project(project_name, incremental=False, workers=None, profile=False, profile_dump=None, trace=None, dry_run=False, exports=True):
+    """Generate the project, return the (path, old content, new content) of the files that changed"""
+    run_start, run_clock = time.time(), time.perf_counter()
+    vfs.collect()
+    profile_dir = tempfile.mkdtemp(prefix="bbg-profile-") if profile_dump else None
+
+    # Create project directories and files
+    base_path = os.path.join(os.getcwd(), OUTPUT_DIR, project_name)
+
+    # every emitter works from the same compiled specification and ERD graph
+    (spec, graph), load_metrics = run_stage("load", load_inputs, (project_name,), profile_dir)
+
+    # a full build ignores what the previous run generated and replaces it entirely
+    manifest = Manifest(base_path, manifest_path(project_name), load=incremental)
+
+    model_stages = [
+        Stage("models" if i == 0 else f"models.{i}", build_models, project_name, graph, manifest, table_ids, i == 0, after=["structure"])
+        for i, table_ids in enumerate(graph.partition(min(workers or os.cpu_count(), -(-len(graph.tables) // MODELS_PER_STAGE))))
+    ]
+
+    # the emitters build the project in memory, it is written to disk in a single flush
+    results, stage_metrics = run_stages(
+        [
+            Stage("structure", build_structure, base_path, incremental),
+            Stage("routes", build_routes, base_path, spec, manifest, after=["structure"]),
+            *model_stages,
+            Stage("docs", build_docs, base_path, spec, manifest, after=["structure"]),
+            Stage("static", mirror_existing_files, project_name, after=["structure"]),
+        ],
+        workers,
+        profile_dir,
+    )
+
+    stage_metrics["load"] = load_metrics
+    for name in ["routes", "docs"] + [stage.name for stage in model_stages]:
+        manifest.merge(results[name])
+
+    if incremental:
+        # remove the outputs of inputs that were deleted since the last run
+        for path in manifest.stale_outputs():
+            vfs.tree.remove(path)
+    manifest.save()
+    if not incremental:
+        vfs.tree.prune(base_path)
+
+    changes = vfs.tree.changes()
+    if dry_run:
+        print(vfs.diff(changes, base_path), end="")
+        print(f"{len(changes)} files would change")
+    else:
+        _, stage_metrics["flush"] = run_stage("flush", vfs.tree.flush, (changes,), profile_dir)
+
+    if exports and not dry_run:
+        def changed(results):
+            """Whether the flush changed anything the later stages depend on"""
+            return not incremental or bool(changes)
+
+        # these stages read the generated project back from disk
+        _, more_metrics = run_stages(
+            [
+                Stage("translations", generate_translations, project_name, when=changed),
+                Stage("postman", export_postman_collection, project_name, spec, when=changed),
+                Stage("postman_tests", export_postman_tests, project_name, when=changed),
+            ],
+            workers,
+            profile_dir,
+        )
+        stage_metrics.update(more_metrics)
+
+    hits = total(stage_metrics, "format_cache_hits")
+    misses = total(stage_metrics, "format_cache_misses")
+    print(f"formatted {hits + misses} sources in {total(stage_metrics, 'format_seconds'):.2f}s ({hits} cache hits)")
+
+    run_seconds = time.perf_counter() - run_clock
+    if profile:
+        print(stage_report(stage_metrics, run_seconds))
+    if trace:
+        write_trace(trace, stage_metrics, run_start, run_seconds)
+    if profile_dir:
+        merge_profiles(profile_dir, profile_dump)
+        su.rmtree(profile_dir)
+    return changes
+
     # su.copytree(base_path, os.path.dirname(os.getcwd()), dirs_exist_ok=True)
 
 
-# Run the generator
-generate_flask_project("QuizQuickie")
+def generator_source(path):
+    """Whether a changed path is code the generator imports rather than reads as data"""
+    if not path.endswith(".py"):
+        return False
+    if os.path.dirname(path) == INPUT_DIR:
+        return os.path.basename(path) not in DATA_INPUTS
+    return path.split(os.sep)[0] in GENERATOR_DIRS
+
+
+def watch_flask_project(project_name, workers=1):
+    """Regenerate the project every time the specification, ERD or static files change,
+    restart when the generator itself changes"""
+    generate_flask_project(project_name, incremental=True, workers=workers, exports=False)
+    watcher = watch.watcher([INPUT_DIR, "static", *GENERATOR_DIRS])
+    print(f"watching {INPUT_DIR}/, static/ and the generator with {watcher.kind}, translations and Postman collections are only exported by a normal run")
+    while True:
+        changed = watcher.wait()
+        # the engine, utils, templates and structure are imported, only a new process picks up their changes,
+        # and the manifest hashes them so that it regenerates what they affect
+        if any(generator_source(path) for path in changed):
+            print("generator changed, restarting")
+            watcher.close()
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+
+        start = time.perf_counter()
+        try:
+            changes = generate_flask_project(project_name, incremental=True, workers=workers, exports=False)
+        except Exception as e:  # the edit may be incomplete, keep watching for the next one
+            print(f"[{e.__class__.__name__}]: {e}")
+            continue
+        for path, _, content in changes:
+            print(f"{'removed' if content is None else 'wrote'} {os.path.relpath(path)}")
+        print(f"regenerated in {time.perf_counter() - start:.3f}s")
+
+
+@ck.command()
+@ck.argument("project_name", default="QuizQuickie")
+@ck.option("--incremental", is_flag=True, help="Only re-emit the outputs whose inputs changed since the last run.")
+@ck.option("-j", "--workers", type=ck.IntRange(min=1), default=None, help="Number of stages to run at once (default: CPU count).")
+@ck.option("--dry-run", is_flag=True, help="Print the diff of the generated project instead of writing it.")
+@ck.option("--watch", is_flag=True, help="Keep running and regenerate the changed outputs whenever config/ or static/ change.")
+@ck.option("--profile", is_flag=True, help="Report the wall and CPU time, files, bytes and subprocesses of every stage.")
+@ck.option("--profile-dump", type=ck.Path(dir_okay=False), default=None, help="Write the merged cProfile stats of all stages to this file.")
+@ck.option("--trace", type=ck.Path(dir_okay=False), default=None, help="Write a Chrome trace-event JSON of the run to this file.")
+def main(project_name, incremental, workers, dry_run, watch, profile, profile_dump, trace):
+    """Generate the backend project from its specification"""
+    if watch:
+        # a single worker keeps the warm inputs in this process instead of pickling them to a pool
+        watch_flask_project(project_name, workers or 1)
+        return
+    generate_flask_project(project_name, incremental, workers, profile, profile_dump, trace, dry_run)
 
 
-import click as ck
+# Run the generator
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Measure the per-request cost of authenticating with each session backend
+
+    python bbg.py && python -m benchmarks.bench_auth_backends [--project dist/QuizQuickie]
+
+Runs current_user against a generated project with a throwaway SQLite
+database, for SessionAuth with its caches emptied before every request (the
+two queries it used to run each time), SessionAuth with warm caches, and
+TokenAuth. The storage session is closed after each request, as the app's
+teardown does.
+"""
+import os
+import sys
+import timeit
+import tempfile
+
+import click as ck
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GC = "import gc; gc.enable()"
+
+
+class Request:
+    """The parts of a flask request the auth managers read"""
+
+    def __init__(self, cookie=None, authorization=None):
+        self.cookies = {"session_id": cookie} if cookie else {}
+        self.headers = {"Authorization": authorization} if authorization else {}
+
+
+@ck.command()
+@ck.option("--project", default=os.path.join(ROOT, "dist", "QuizQuickie"), help="Generated project to load the auth managers from.")
+@ck.option("--number", type=ck.IntRange(min=1), default=2000, help="Requests per measurement.")
+def main(project, number):
+    """Benchmark SessionAuth against TokenAuth"""
+    workdir = tempfile.mkdtemp(prefix="bench_auth_")
+    os.environ.update(
+        QQ_DB_ENGINE="SQLITE",
+        QQ_DB=os.path.join(workdir, "bench"),
+        SESSION_NAME="session_id",
+        TOKEN_SECRET="bench",
+    )
+    os.environ.pop("SESSION_CACHE", None)
+    sys.path.insert(0, os.path.abspath(project))
+
+    from models import storage, User
+    from api.v1.auth import SessionAuth, TokenAuth
+
+    user_id = storage.query(User).where(User.user_name == "admin").one().id
+    session_auth = SessionAuth()
+    token_auth = TokenAuth()
+    session_request = Request(cookie=session_auth.create_session(user_id))
+    token_request = Request(authorization=f"Bearer {token_auth.create_session(user_id)}")
+    storage.close()
+
+    def cold_session():
+        SessionAuth.sessions.clear()
+        SessionAuth.users.clear()
+        return session_auth.current_user(session_request)
+
+    def warm_session():
+        return session_auth.current_user(session_request)
+
+    def token():
+        return token_auth.current_user(token_request)
+
+    print(f"{'backend':<24} {'per request':>12} {'requests/s':>12}")
+    for name, authenticate in [
+        ("session, no cache", cold_session),
+        ("session, cached", warm_session),
+        ("token", token),
+    ]:
+        def request():
+            assert authenticate().id == user_id
+            storage.close()
+
+        request()
+        seconds = min(timeit.repeat(request, GC, number=number, repeat=3)) / number
+        print(f"{name:<24} {seconds * 1e6:>10.1f}us {1 / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""Measure how the generator stages scale with the size of the specification and ERD
+
+    python -m benchmarks.bench_generator [--routes 100 1000 10000] [--tables 10 100 1000]
+
+Every stage runs in a fresh output tree, its wall time is the best of --repeat
+runs and its peak memory is traced in an extra run. Black formatting dwarfs the
+emitters themselves, so it is left out unless --format is given (with a cold
+formatting cache on every run). The results are saved as JSON in
+benchmarks/results, pass an older results file to --compare to see the
+regressions between versions.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime, timezone
+
+import click as ck
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine import OUTPUT_DIR, formatting, metrics, vfs
+from engine.routes import generate_routes
+from engine.models import generate_models
+from engine.erd import build_graph
+from engine.swagger import generate_yaml_files
+from engine.postman import generate_postman_collection
+from engine.structure import create_directories
+from engine.spec import compile_spec
+from config.structure import project_structure
+from benchmarks.synthetic import synthetic_endpoints, synthetic_erd
+
+PROJECT_NAME = "Bench"
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def base_path():
+    return os.path.join(os.getcwd(), OUTPUT_DIR, PROJECT_NAME)
+
+
+# each stage takes the synthetic input it scales with
+STAGES = {
+    "spec": ("routes", compile_spec),
+    "routes": ("spec", lambda spec: generate_routes(base_path(), spec)),
+    "docs": ("spec", lambda spec: generate_yaml_files(base_path(), spec)),
+    "postman": ("spec", lambda spec: generate_postman_collection(PROJECT_NAME, spec, save_to_account=False)),
+    "erd": ("tables", lambda erd: build_graph(json.loads(erd))),
+    "models": ("graph", lambda graph: generate_models(PROJECT_NAME, graph)),
+}
+
+
+def run_once(stage, data, trace=False):
+    """Run a stage in a fresh temporary project, return its wall time, peak memory and counters"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            create_directories(base_path(), project_structure)
+            vfs.collect().flush()
+            metrics.collect()
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            STAGES[stage][1](data)
+            vfs.collect().flush()
+            seconds = time.perf_counter() - start
+            peak = 0
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            return seconds, peak, metrics.collect()
+        finally:
+            os.chdir(cwd)
+
+
+def bench(stage, size, data, repeat):
+    timings = [run_once(stage, data) for _ in range(repeat)]
+    seconds, _, counters = min(timings, key=lambda t: t[0])
+    _, peak, _ = run_once(stage, data, trace=True)
+    result = {
+        "stage": stage,
+        "input": STAGES[stage][0],
+        "size": size,
+        "seconds": round(seconds, 6),
+        "peak_memory": peak,
+        "format_seconds": round(counters.get("format_seconds", 0), 6),
+    }
+    print(f"{stage:>8} {size:>6} {STAGES[stage][0]:<7} {seconds:9.3f}s  {peak / 2**20:8.1f} MiB")
+    return result
+
+
+def version():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = {(r["stage"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\ncompared to {previous_path}:")
+    for result in results:
+        old = previous.get((result["stage"], result["size"]))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        print(f"{result['stage']:>8} {result['size']:>6} {ratio:6.2f}x time  {result['peak_memory'] / max(old['peak_memory'], 1):6.2f}x memory")
+
+
+@ck.command()
+@ck.option("--routes", "route_sizes", type=int, multiple=True, default=[100, 1000, 10000], help="Numbers of routes to synthesize.")
+@ck.option("--tables", "table_sizes", type=int, multiple=True, default=[10, 100, 1000], help="Numbers of ERD tables to synthesize.")
+@ck.option("--stage", "stages", type=ck.Choice(list(STAGES)), multiple=True, default=list(STAGES), help="Stages to measure.")
+@ck.option("--format/--no-format", "fmt", default=False, help="Include black formatting in the measured stages.")
+@ck.option("--repeat", type=ck.IntRange(min=1), default=3, help="Timed runs per stage and size.")
+@ck.option("--output", type=ck.Path(dir_okay=False), default=None, help="Results file (default: benchmarks/results/<version>.json).")
+@ck.option("--compare", "previous", type=ck.Path(exists=True, dir_okay=False), default=None, help="Earlier results file to compare with.")
+def main(route_sizes, table_sizes, stages, fmt, repeat, output, previous):
+    """Benchmark the generator stages on synthetic inputs"""
+    formatting.enabled = fmt
+    inputs = {
+        "routes": {size: synthetic_endpoints(size) for size in route_sizes},
+        "tables": {size: json.dumps(synthetic_erd(size)) for size in table_sizes},
+    }
+    inputs["spec"] = {size: compile_spec(endpoints) for size, endpoints in inputs["routes"].items()}
+    inputs["graph"] = {size: build_graph(json.loads(erd)) for size, erd in inputs["tables"].items()}
+    results = []
+    for stage in stages:
+        for size, data in inputs[STAGES[stage][0]].items():
+            results.append(bench(stage, size, data, repeat))
+
+    report = {
+        "version": version(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "formatting": fmt,
+        "results": results,
+    }
+    output = output or os.path.join(RESULTS_DIR, f"{report['version']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results saved to {output}")
+
+    if previous:
+        compare(results, previous)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""Measure the quiz submissions per second with the answers committed one by one and in bulk
+
+    python bbg.py && python -m benchmarks.bench_quiz_submission [--questions 50] [--options 2]
+
+Writes the attempts of a quiz against a generated project with a throwaway
+SQLite database, the way the submission route used to (a commit for every
+selected option, then one for the score) and the way it does now (the scored
+attempt flushed for its id and the answers inserted in one executemany, in a
+single transaction). The storage session is closed after each submission, as
+the app's teardown does. The submission route itself is then measured through
+the test client of the app, logged in as the admin.
+"""
+import os
+import sys
+import timeit
+import tempfile
+
+import click as ck
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GC = "import gc; gc.enable()"
+
+
+@ck.command()
+@ck.option("--project", default=os.path.join(ROOT, "dist", "QuizQuickie"), help="Generated project to load the models from.")
+@ck.option("--questions", type=ck.IntRange(min=1), default=50, help="Questions of the quiz.")
+@ck.option("--options", type=ck.IntRange(min=1), default=2, help="Options selected for each question.")
+@ck.option("--number", type=ck.IntRange(min=1), default=20, help="Submissions per measurement.")
+def main(project, questions, options, number):
+    """Benchmark committing the answers of a submission one by one against in bulk"""
+    workdir = tempfile.mkdtemp(prefix="bench_submission_")
+    os.environ.update(QQ_DB_ENGINE="SQLITE", QQ_DB=os.path.join(workdir, "bench"), AUTH="SESSION_AUTH")
+    os.environ.setdefault("SESSION_NAME", "session_id")
+    os.environ.pop("QQ_CACHE", None)
+    sys.path.insert(0, os.path.abspath(project))
+
+    from sqlalchemy import event
+    from models import storage, Answer, Question, Quiz, QuizAttempt, User, UserAnswer
+
+    user_id = storage.query(User).where(User.user_name == "admin").one().id
+    quiz = storage.new(Quiz(title="bench", category="bench", difficulty=1, points=questions, user_id=user_id))
+    storage.flush()
+    for order in range(questions):
+        question = storage.new(Question(statement=f"q{order}", quiz_id=quiz.id, points=1, type="mcq", order=order))
+        storage.flush()
+        storage.new_many([
+            Answer(text=f"a{i}", order=i, question_id=question.id, correct=i < options)
+            for i in range(options + 2)
+        ])
+    storage.save()
+    quiz_id = quiz.id
+    answers = [{"options": list(range(options))} for _ in range(questions)]
+    storage.close()
+
+    commits = []
+    event.listen(storage._engine, "commit", lambda conn: commits.append(conn))
+
+    def score(quiz):
+        """The total score and full score of the answers, as the route computes them"""
+        total_score, full_score = 0, True
+        for ans, q in zip(answers, quiz.questions):
+            if set(a.order for a in q.answers if a.correct) == set(ans["options"]):
+                total_score += q.points
+            else:
+                full_score = False
+        return total_score, full_score
+
+    def one_by_one():
+        quiz = storage.get(Quiz, quiz_id)
+        attempt = storage.new(QuizAttempt(score=0, quiz_id=quiz_id, user_id=user_id, full_score=False)).save()
+        for ans, q in zip(answers, quiz.questions):
+            for a in ans["options"]:
+                storage.new(UserAnswer(attempt_id=attempt.id, answer=a, question_id=q.id)).save()
+        attempt.score, attempt.full_score = score(quiz)
+        attempt.save()
+
+    def bulk():
+        quiz = storage.get(Quiz, quiz_id)
+        total_score, full_score = score(quiz)
+        attempt = storage.new(QuizAttempt(score=total_score, quiz_id=quiz_id, user_id=user_id, full_score=full_score))
+        storage.flush()
+        storage.bulk_insert(UserAnswer, [
+            {"attempt_id": attempt.id, "answer": a, "question_id": q.id}
+            for ans, q in zip(answers, quiz.questions)
+            for a in ans["options"]
+        ])
+        storage.save()
+
+    print(f"{questions} questions, {options} options selected each")
+    print(f"{'answers committed':<20} {'commits':>8} {'per submission':>15} {'submissions/s':>14}")
+    for name, submit in [("one by one", one_by_one), ("in bulk", bulk)]:
+        def request():
+            submit()
+            storage.close()
+
+        before = storage.count(UserAnswer)
+        commits.clear()
+        request()
+        assert storage.count(UserAnswer) - before == questions * options
+        storage.close()
+        per_submission = len(commits)
+        seconds = min(timeit.repeat(request, GC, number=number, repeat=3)) / number
+        print(f"{name:<20} {per_submission:>8} {seconds * 1e3:>13.2f}ms {1 / seconds:>14.1f}")
+
+    from api.v1.app import app
+
+    client = app.test_client()
+    assert client.post("/api/v1/auth/login", json={"email": "admin@quizquickie.com", "password": "admin"}).status_code == 200
+
+    def route():
+        response = client.post(f"/api/v1/user/profile/quiz/{quiz_id}/attempts", json={"answers": answers})
+        assert response.status_code == 200, response.get_json()
+
+    before = storage.count(UserAnswer), storage.count(QuizAttempt)
+    storage.close()
+    commits.clear()
+    route()
+    assert storage.count(UserAnswer) - before[0] == questions * options
+    assert storage.count(QuizAttempt) - before[1] == 1
+    storage.close()
+    per_submission = len(commits)
+    seconds = min(timeit.repeat(route, GC, number=number, repeat=3)) / number
+    print(f"{'route':<20} {per_submission:>8} {seconds * 1e3:>13.2f}ms {1 / seconds:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Measure the peak memory of reading a whole table with storage.all and storage.iter_all
+
+    python bbg.py && python -m benchmarks.bench_storage_all [--rows 10000 50000 200000]
+
+Fills the quiz table of a generated project with a throwaway SQLite database
+and reads it back three ways: all(), which builds a dict of every object,
+iter_all() streaming the objects in chunks, and iter_all() streaming only a
+projection of two columns. The peak is traced with tracemalloc, the time is
+that of a single pass.
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+import click as ck
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@ck.command()
+@ck.option("--project", default=os.path.join(ROOT, "dist", "QuizQuickie"), help="Generated project to load the models from.")
+@ck.option("--rows", type=ck.IntRange(min=1), multiple=True, default=[10000, 50000, 200000], help="Table sizes to measure.")
+@ck.option("--chunk-size", type=ck.IntRange(min=1), default=1000, help="Rows per chunk of iter_all.")
+def main(project, rows, chunk_size):
+    """Benchmark all() against iter_all() as the table grows"""
+    workdir = tempfile.mkdtemp(prefix="bench_all_")
+    os.environ.update(QQ_DB_ENGINE="SQLITE", QQ_DB=os.path.join(workdir, "bench"))
+    os.environ.pop("QQ_CACHE", None)
+    sys.path.insert(0, os.path.abspath(project))
+
+    from models import storage, Quiz, User
+
+    user_id = storage.query(User).where(User.user_name == "admin").one().id
+    storage.close()
+
+    readers = [
+        ("all()", lambda: len(storage.all(Quiz))),
+        ("iter_all()", lambda: sum(1 for _ in storage.iter_all(Quiz, chunk_size=chunk_size))),
+        ("iter_all(columns)", lambda: sum(1 for _ in storage.iter_all(Quiz, ["id", "title"], chunk_size))),
+    ]
+
+    print(f"{'rows':>8} {'reader':<20} {'peak':>10} {'time':>9}")
+    total = 0
+    for size in sorted(rows):
+        storage.bulk_insert(Quiz, [
+            {"title": f"quiz {i}", "category": "bench", "difficulty": 1, "points": 10, "user_id": user_id}
+            for i in range(total, size)
+        ])
+        storage.save()
+        storage.close()
+        total = size
+        for name, read in readers:
+            tracemalloc.start()
+            started = time.perf_counter()
+            assert read() == size
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            storage.close()
+            print(f"{size:>8} {name:<20} {peak / 2**20:>8.1f}MB {seconds:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Synthetic specifications and ERDPlus documents for the generator benchmarks
+"""
+import random
+
+from utils.http_constants import *
+from utils.unquoted_string import _
+
+# generated handlers only know how to parse these request field types
+REQUEST_TYPES = ["str", "int", "float", "datetime", "url"]
+RESPONSE_TYPES = REQUEST_TYPES + ["email"]
+METHODS = [GET, POST, PUT, DELETE]
+
+
+def synthetic_fields(rng, count, types=RESPONSE_TYPES):
+    """Make a request or response body with a mix of required and optional fields"""
+    fields = {}
+    for i in range(count):
+        name = f"field_{i}" + ("?" if rng.random() < 0.3 else "")
+        fields[name] = rng.choice(types)
+    if rng.random() < 0.2:
+        fields["items"] = [{"item_id": "int", "value": "str"}]
+    return fields
+
+
+def synthetic_endpoints(routes, routes_per_section=40, seed=0):
+    """Make an endpoints specification with the given number of routes (path and method pairs)"""
+    rng = random.Random(seed)
+    endpoints = {}
+    made = 0
+    while made < routes:
+        section = f"section_{len(endpoints)}"
+        paths = endpoints[section] = {}
+        while made < routes and sum(len(m) for m in paths.values()) < routes_per_section:
+            resource = f"/api/v1/{section}/resource_{len(paths)}"
+            if rng.random() < 0.5:
+                resource += "/<int:resource_id>"
+                if rng.random() < 0.3:
+                    resource += "/child/<int:child_id>"
+            methods = paths[resource] = {}
+            for method in rng.sample(METHODS, rng.randint(1, len(METHODS))):
+                if made == routes:
+                    break
+                details = {
+                    "desc": f"{method.lower()} the {resource} resource",
+                    "tags": ["User"],
+                    "request": synthetic_fields(rng, rng.randint(0, 8), REQUEST_TYPES),
+                    "responses": {
+                        OK: [synthetic_fields(rng, rng.randint(1, 10))],
+                        NOT_FOUND: [{"error": _("_('not_found', data=_('resource'))")}],
+                        UNAUTHORIZED: [{"error": _("_('unauthorized')")}],
+                    },
+                }
+                if method == GET and rng.random() < 0.4:
+                    details["pagination"] = "items"
+                methods[method] = details
+                made += 1
+    return endpoints
+
+
+def synthetic_attribute(attr_id, name, data_type="int", size=None, fk=None, optional=False):
+    attribute = {
+        "names": [name],
+        "order": attr_id,
+        "pkMember": name == "id",
+        "optional": optional,
+        "soloUnique": False,
+        "fk": fk is not None,
+        "dataType": data_type,
+        "dataTypeSize": size,
+        "id": attr_id,
+    }
+    if fk is not None:
+        attribute["references"] = [{"tableId": fk, "attributeId": 1}]
+    return attribute
+
+
+def synthetic_erd(tables, mm_ratio=0.15, oo_ratio=0.05, seed=0):
+    """Make an ERDPlus document with plain tables linked by foreign keys, plus
+    many to many and one to one association tables
+    """
+    rng = random.Random(seed)
+    shapes = []
+    table_ids = []
+    next_id = 1
+
+    def add_table(name, attributes):
+        nonlocal next_id
+        table_id = next_id
+        next_id += 1
+        shapes.append({
+            "type": "Table",
+            "details": {"name": name, "x": 0, "y": 0, "sort": "automatic", "attributes": attributes, "uniqueGroups": [[]], "id": table_id},
+        })
+        return table_id
+
+    associations = int(tables * (mm_ratio + oo_ratio))
+    for i in range(tables - associations):
+        attributes = [synthetic_attribute(1, "id")]
+        for j in range(rng.randint(2, 8)):
+            data_type, size = rng.choice([("int", None), ("float", None), ("varcharn", "50"), ("charn", "8"), ("date", None), ("custom", "DATETIME")])
+            attributes.append(synthetic_attribute(len(attributes) + 1, f"column_{j}", data_type, size, optional=rng.random() < 0.3))
+        # most tables point to one or two earlier tables
+        for parent in rng.sample(table_ids, min(len(table_ids), rng.randint(0, 2))):
+            attributes.append(synthetic_attribute(len(attributes) + 1, f"table_{parent}_id", fk=parent, optional=rng.random() < 0.2))
+        table_ids.append(add_table(f"table_{next_id}", attributes))
+
+    names = {shape["details"]["id"]: shape["details"]["name"] for shape in shapes}
+    pairs = set()
+    for i in range(associations):
+        left, right = rng.sample(table_ids, 2)
+        if (left, right) in pairs:
+            continue
+        pairs.add((left, right))
+        kind = "mm" if i < tables * mm_ratio else "oo"
+        add_table(f"{names[left]}-{names[right]}-{kind}", [
+            synthetic_attribute(1, f"{names[left]}_id", fk=left),
+            synthetic_attribute(2, f"{names[right]}_id", fk=right),
+        ])
+    return {"version": 2, "www": "erdplus.com", "shapes": shapes, "connectors": [], "width": 0, "height": 0}
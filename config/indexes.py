@@ -0,0 +1,5 @@
+# Columns to index in the generated models, by table name. ERDPlus has no way
+# to mark them, unique columns are indexed by their constraint already.
+indexes = {
+    "user_session": ["expiry_date"],
+}
@@ -0,0 +1,7 @@
+# Default loader strategy of the relationships of the generated models, by table
+# name and relationship attribute: "select" (lazy, the default), "selectin",
+# "joined", "subquery", "immediate", "raise" or "noload". Endpoints load more
+# eagerly where they need to with their "preload" key.
+loaders = {
+    "question": {"answers": "selectin"},
+}
@@ -21,6 +21,23 @@ endpoints = {
                     UNAUTHORIZED: [{"error": _("_('unauthorized')")}],
                 },
                 "snippet": '''
+''',
+            }
+        },
+        "/api/v1/stats/ops": {
+            GET: {
+                "desc": "report the operational metrics of the worker to the admins",
+                "request": {},
+                "responses": {
+                    OK: [{
+                        "table_counts": {"age_s": "float", "refreshes": "int", "last_refresh_ms": "float"},
+                        "password_hashing": {"workers": "int", "pending": "int", "rejected": "int"},
+                        "database_pool": {"size": "int", "checked_out": "int", "idle": "int", "overflow": "int"},
+                    }],
+                    UNAUTHORIZED: [{"error": _("_('unauthorized')")}],
+                    FORBIDDEN: [{"error": _("_('forbidden')")}],
+                },
+                "snippet": '''
 ''',
             }
         },
@@ -51,15 +68,17 @@ endpoints = {
                     }],
                 },
                 "snippet": '''
-    from bcrypt import gensalt, hashpw
+    from api.v1.password_hashing import hasher, HasherBusy
     try:
-        req["password"] = hashpw(req["password"].encode(), gensalt())
+        req["password"] = hasher.hashpw(req["password"])
         from sqlalchemy import or_
         if storage.query(User).where(or_(User.email==req["email"], User.user_name==req["user_name"])).count() > 0:
             return jsonify({'error': _('duplicate', data=_('email or user name'))}), 409
         storage.new(User(**req))
         storage.save()
         return jsonify({}), 201
+    except HasherBusy:
+        raise
     except Exception as e:
         print(e)
         abort(500)
@@ -78,19 +97,20 @@ endpoints = {
                     }],
                 },
                 "snippet": '''
-    from bcrypt import checkpw
+    from api.v1.password_hashing import hasher, HasherBusy
     from api.v1.auth import auth, SessionAuth
     from os import getenv
     try:
         user: User = storage.query(User).where(User.email==req["email"]).one_or_none()
-        pass_bytes = req["password"].encode()
-        if user is None or not checkpw(pass_bytes, user.password):
+        if user is None or not hasher.checkpw(req["password"], user.password):
             return jsonify({'error': _('invalid', data=_('login details'))}), 401
         resp = jsonify({})
         if isinstance(auth, SessionAuth):
             session_id = auth.create_session(user.id)
             resp.set_cookie(getenv("SESSION_NAME"), session_id)
         return resp, 200
+    except HasherBusy:
+        raise
     except Exception as e:
         print(req)
         print(f'{e.__class__.__name__}: {e}')
@@ -136,6 +156,19 @@ endpoints = {
                     UNAUTHORIZED: [{"error": _("_('unauthorized')")}],
                 },
                 "snippet": '''
+    from api.v1.auth import auth, SessionAuth
+    user = getattr(g, "user", None)
+    if user is None:
+        return jsonify({"error": _("unauthorized")}), 401
+
+    try:
+        if isinstance(auth, SessionAuth):
+            auth.destroy_session(request)
+            storage.save()
+        return jsonify({}), 204
+    except Exception as e:
+        print(f"[{e.__class__.__name__}]: {e}")
+        abort(500)
 ''',
             }
         },
@@ -149,6 +182,19 @@ endpoints = {
                     UNAUTHORIZED: [{"error": _("_('unauthorized')")}],
                 },
                 "snippet": '''
+    from api.v1.auth import auth, SessionAuth
+    user = getattr(g, "user", None)
+    if user is None:
+        return jsonify({"error": _("unauthorized")}), 401
+
+    try:
+        if isinstance(auth, SessionAuth):
+            auth.destroy_session(request)
+        user.delete()
+        return jsonify({}), 204
+    except Exception as e:
+        print(f"[{e.__class__.__name__}]: {e}")
+        abort(500)
 ''',
             }
         },
@@ -233,7 +279,7 @@ endpoints = {
             GET: {
                 "desc": "respond with all user's quiz attempts",
                 "pagination": "attempts",
-                "tags": ['User', 'Quiz'],
+                "tags": ['User', 'Quiz', 'QuizAttempt'],
                 "request": {},
                 "responses": {
                     OK: [{"attempt_id": "int", "time": "datetime", "score": "int"}],
@@ -267,7 +313,8 @@ endpoints = {
         try:
             return (
                 paginate(
-                    "attempts", query, page, page_size, lambda a: {"attempt_id": a.id, "time": datetime.strftime(a.created_at, time_fmt), "score": a.score}
+                    "attempts", query, page, page_size, lambda a: {"attempt_id": a.id, "time": datetime.strftime(a.created_at, time_fmt), "score": a.score},
+                    count=count_strategy(req.get("count", None)),
                 ),
                 200,
             )
@@ -285,7 +332,8 @@ endpoints = {
             },
             POST: {
                 "desc": "submit user answers for the quiz's questions",
-                "tags": ['User', 'Quiz'],
+                "tags": ['User', 'Quiz', 'QuizAttempt', 'UserAnswer'],
+                "preload": {"Quiz.questions.answers": "selectin"},
                 "request": {"answers": [{"options": ["int"]}]},
                 "responses": {
                     OK: [{
@@ -304,7 +352,7 @@ endpoints = {
     answers = req["answers"]
 
     try:
-        quiz = storage.query(Quiz).get(quiz_id)
+        quiz = storage.query(Quiz).options(*PRELOAD).where(Quiz.id == quiz_id).one_or_none()
 
         if quiz is None:
             return jsonify({"error": _("not_found", data=_("quiz"))}), 404
@@ -313,15 +361,10 @@ endpoints = {
         if len(answers) != len(quiz.questions):
             return jsonify({"error": _("invalid", data=_("answer option"))}), 404
 
-        attempt = storage.new(QuizAttempt(score=0, quiz_id=quiz_id, user_id=user.id))
-
-
         total_score = 0
         full_score = True
         correct_answers = []
         for ans, q in zip(answers, quiz.questions):
-            for a in ans['options']:
-                storage.new(UserAnswer(attempt_id=attempt.id, answer=a, question_id=q.id)).save()
             correct_answer = set(a.order for a in q.answers if a.correct)
             if correct_answer == set(ans['options']):
                 total_score += q.points
@@ -329,9 +372,15 @@ endpoints = {
                 full_score = False
             correct_answers.append({'options': list(correct_answer)})
 
-        attempt.score = total_score
-        attempt.full_score = full_score
-        attempt.save()
+        # the scored attempt and all its answers in one transaction
+        attempt = storage.new(QuizAttempt(score=total_score, quiz_id=quiz_id, user_id=user.id, full_score=full_score))
+        storage.flush()
+        storage.bulk_insert(UserAnswer, [
+            {"attempt_id": attempt.id, "answer": a, "question_id": q.id}
+            for ans, q in zip(answers, quiz.questions)
+            for a in ans['options']
+        ])
+        storage.save()
 
         return (
             jsonify({"score": total_score, "correct_answers": correct_answers}),
@@ -363,7 +412,7 @@ endpoints = {
 
     try:
         try:
-            return paginate("groups", query, page, page_size, None, apply=lambda g: {"group_id": g.id, "group_title": g.title}), 200
+            return paginate("groups", query, page, page_size, None, apply=lambda g: {"group_id": g.id, "group_title": g.title}, count=count_strategy(req.get("count", None))), 200
         except ValueError as e:
             data = (e.args[0]if e.args and e.args[0] in ("page", "page_size") else "request")
             return jsonify({"error": _("invalid", data=_(data))}), 422
@@ -452,6 +501,7 @@ endpoints = {
                     req.get("page", None),
                     req.get("page_size", None),
                     apply=lambda group: {"group_id": group.id, "title": group.title},
+                    count=count_strategy(req.get("count", None)),
                 ),
                 200,
             )
@@ -496,12 +546,9 @@ endpoints = {
 
         if storage.query(Group).filter_by(title=title).count() > 0:
             return jsonify({"error": _("duplicate", data=_("group"))}), 409
-        storage.new(
-            Group(
-                title=title,
-                ownership_id=storage.new(Ownership(user_id=user.id)).save().id,
-            )
-        )
+        ownership = storage.new(Ownership(user_id=user.id))
+        storage.flush()
+        storage.new(Group(title=title, ownership_id=ownership.id))
         storage.save()
         return jsonify({}), 201
     except Exception as e:
@@ -579,7 +626,7 @@ endpoints = {
         "/api/v1/user/group/<int:group_id>/users": {
             GET: {
                 "desc": "get all the group subscribed users",
-                "pagination": "users",
+                "pagination": {"items": "users", "count": "cached"},
                 "tags": ['User', 'Group', 'Ownership', 'QuizAttempt'],
                 "request": {},
                 "responses": {
@@ -619,7 +666,7 @@ endpoints = {
         )
 
         try:
-            return paginate("users", query, page, page_size, lambda u: {'user_id': u[0].id, 'user_name': u[0].user_name, 'total_score': u[1], 'attempted_quizzes': u[2]}), 200
+            return paginate("users", query, page, page_size, lambda u: {'user_id': u[0].id, 'user_name': u[0].user_name, 'total_score': u[1], 'attempted_quizzes': u[2]}, count=count_strategy(req.get('count', None), "cached")), 200
         except ValueError as e:
             data = e.args[0] if e.args and e.args[0] in ("page", "page_size") else "request"
             return jsonify({"error": _("invalid", data=_(data))}), 422
@@ -703,7 +750,8 @@ endpoints = {
         try:
             return (
                 paginate(
-                    "quizzes", query, req.get("page", None), req.get("page_size", None)
+                    "quizzes", query, req.get("page", None), req.get("page_size", None),
+                    count=count_strategy(req.get("count", None)),
                 ),
                 200,
             )
@@ -1011,6 +1059,7 @@ endpoints = {
                 "desc": "respond with stats about the user attempts of the quiz",
                 "pagination": "attempts",
                 "tags": ['User', 'QuizAttempt', 'Quiz'],
+                "preload": {"QuizAttempt.user": "joined"},
                 "request": {},
                 "responses": {
                     OK: [{
@@ -1035,11 +1084,11 @@ endpoints = {
         quiz: Quiz = storage.query(Quiz).where(Quiz.user_id==user.id).filter_by(id=quiz_id).one_or_none()
         if quiz is None:
             return jsonify({'error': _('not_found', data=_('quiz'))}), 404
-        query = storage.query(QuizAttempt).where(QuizAttempt.quiz_id==quiz_id)
+        query = storage.query(QuizAttempt).options(*PRELOAD).where(QuizAttempt.quiz_id==quiz_id)
         if title_query:
             query = query.where(and_(QuizAttempt.user_id==User.id, User.user_name.like(f'%{title_query}%')))
         try:
-            return paginate("attempts", query, page, page_size, apply=lambda a: {'user_id': a.user.id, 'user_name': a.user.user_name, 'attempt_id': a.id, 'time': a.created_at, 'points': a.score}), 200
+            return paginate("attempts", query, page, page_size, apply=lambda a: {'user_id': a.user.id, 'user_name': a.user.user_name, 'attempt_id': a.id, 'time': a.created_at, 'points': a.score}, count=count_strategy(req.get('count', None))), 200
         except ValueError as e:
             data = e.args[0] if e.args and e.args[0] in ("page", "page_size") else "request"
             return jsonify({"error": _("invalid", data=_(data))}), 422
@@ -1071,7 +1120,7 @@ endpoints = {
         "/api/v1/profile": {
             GET: {
                 "desc": "respond with user profile info",
-                "pagination": "users",
+                "pagination": {"items": "users", "mode": "both", "count": "estimated"},
                 "tags": ['User'],
                 "request": {},
                 "responses": {
@@ -1083,6 +1132,8 @@ endpoints = {
                 "snippet": '''
     page = int(req['page']) if req.get('page', None) else None
     page_size = int(req['page_size']) if req.get('page_size', None) else None
+    after = req.get('after', None)
+    before = req.get('before', None)
     username_query = req.get('query', None)
 
     try:
@@ -1091,9 +1142,12 @@ endpoints = {
         if username_query:
             query = query.where(User.user_name.like(f'%{username_query}%'))
 
-        return paginate("users", query, page, page_size, lambda u: {'user_id': u[0], 'user_name': u[1]}), 200
+        apply = lambda u: {'user_id': u[0], 'user_name': u[1]}
+        if after is None and before is None:
+            return paginate("users", query, page, page_size, apply, cursor=True, count=count_strategy(req.get('count', None), "estimated")), 200
+        return paginate_cursor("users", query, None, after, before, page_size, apply), 200
     except ValueError as e:
-        data = e.args[0] if e.args and e.args[0] in ("page", "page_size") else "request"
+        data = e.args[0] if e.args and e.args[0] in ("page", "page_size", "cursor") else "request"
         return jsonify({"error": _("invalid", data=_(data))}), 422
     except Exception as e:
         print(f'[{e.__class__.__name__}]: {e}')
@@ -1155,7 +1209,7 @@ endpoints = {
         "/api/v1/quiz": {
             GET: {
                 "desc": "respond with quizzes with different filters",
-                "pagination": "quizzes",
+                "pagination": {"items": "quizzes", "mode": "both", "count": "estimated"},
                 "tags": ['Quiz'],
                 "request": {
                     "category?": "str",
@@ -1191,6 +1245,8 @@ endpoints = {
     group_id = int(req['group_id']) if req.get('group_id', None) else None
     page = int(req['page']) if req.get('page', None) else None
     page_size = int(req['page_size']) if req.get('page_size', None) else None
+    after = req.get('after', None)
+    before = req.get('before', None)
     title_query = req['query'] if req.get('query', None) else None
 
     try:
@@ -1200,6 +1256,7 @@ endpoints = {
             query = query.where(Quiz.group_id == group_id)
         if title_query:
             query = query.where(Quiz.title.like(f'%{title_query}%'))
+        key = None
         if sort_by in (
             "title",
             "category",
@@ -1209,12 +1266,17 @@ endpoints = {
             "start",
             "end",
         ):
-            query = query.order_by(getattr(Quiz, sort_by))
+            key = getattr(Quiz, sort_by)
         if category:
             query = query.where(Quiz.category == category)
         if difficulty:
             query = query.where(Quiz.difficulty == difficulty)
-        return paginate("quizzes", query, page, page_size), 200
+        if after is None and before is None:
+            return paginate("quizzes", query, page, page_size, cursor=True, key=key, count=count_strategy(req.get('count', None), "estimated")), 200
+        return paginate_cursor("quizzes", query, key, after, before, page_size), 200
+    except ValueError as e:
+        data = e.args[0] if e.args and e.args[0] in ("page", "page_size", "cursor") else "request"
+        return jsonify({"error": _("invalid", data=_(data))}), 422
     except Exception as e:
         print(f'[{e.__class__.__name__}]: {e}')
         abort(500)
@@ -1225,6 +1287,7 @@ endpoints = {
             GET: {
                 "desc": "respond with the quiz's list of questions",
                 "tags": ['Quiz', 'Question'],
+                "preload": {"Question.answers": "selectin"},
                 "request": {},
                 "responses": {
                     OK: [{
@@ -1246,7 +1309,7 @@ endpoints = {
             return jsonify({'error': _('not_found', data=_('quiz'))}), 404
 
         questions = []
-        for q in storage.query(Question).where(Question.quiz_id==quiz_id).order_by(Question.order).all():
+        for q in storage.query(Question).options(*PRELOAD).where(Question.quiz_id==quiz_id).order_by(Question.order).all():
             questions.append({
                 "statement": q.statement,
                 "points": q.points,
@@ -1296,8 +1359,9 @@ endpoints = {
         "/api/v1/group": {
             GET: {
                 "desc": "respond with a list of available user groups",
-                "pagination": "groups",
+                "pagination": {"items": "groups", "count": "estimated"},
                 "tags": ['User', 'Group', 'Ownership'],
+                "preload": {"Group.ownership.user": "joined"},
                 "request": {},
                 "responses": {
                     OK: [{
@@ -1313,13 +1377,13 @@ endpoints = {
     title_query = req['query'] if req.get('query', None) else None
 
     try:
-        query = storage.query(Group)
+        query = storage.query(Group).options(*PRELOAD)
         if title_query:
             query = query.where(Group.title.like(f'%{title_query}%'))
         try:
             return paginate("groups", query, page, page_size, apply=lambda group: {
-                'group_id': group.id, 'title': group.title, 'owner_id': group.ownership.user_id, 'owner_name': group.ownership.user.user_name}
-                            ), 200
+                'group_id': group.id, 'title': group.title, 'owner_id': group.ownership.user_id, 'owner_name': group.ownership.user.user_name},
+                            count=count_strategy(req.get('count', None), "estimated")), 200
         except ValueError as e:
             data = e.args[0] if e.args and e.args[0] in ("page", "page_size") else "request"
             return jsonify({"error": _("invalid", data=_(data))}), 422
@@ -1332,8 +1396,9 @@ endpoints = {
         "/api/v1/group/<int:group_id>/users": {
             GET: {
                 "desc": "respond with a list of the groups subscribed users",
-                "pagination": "users",
+                "pagination": {"items": "users", "count": "cached"},
                 "tags": ['User', 'Group', 'QuizAttempt'],
+                "preload": {"User.user_sessions": "selectin"},
                 "request": {
                     "sort_by?": "str",
                     "status?": "str",
@@ -1368,6 +1433,7 @@ endpoints = {
         # return jsonify({'error': _('unauthorized')}), 403
         query = (
             storage.query(User, func.sum(QuizAttempt.score))
+            .options(*PRELOAD)
             .join(QuizAttempt, User.id == QuizAttempt.user_id)  # Join User with QuizAttempt
             .join(Quiz, QuizAttempt.quiz_id == Quiz.id)  # Join QuizAttempt with Quiz
             .where(Quiz.group_id == group_id)  # Filter by the Quiz group ID
@@ -1389,7 +1455,7 @@ endpoints = {
             if sort_by == 'user_name':
                 query = query.order_by(User.user_name.asc())
         try:
-            return paginate("users", query, page, page_size, apply=lambda u: {'user_id': u[0].id, 'user_name': u[0].user_name, 'status': "active" if len(u[0].user_sessions) > 0 else "away", 'score': u[1]}), 200
+            return paginate("users", query, page, page_size, apply=lambda u: {'user_id': u[0].id, 'user_name': u[0].user_name, 'status': "active" if len(u[0].user_sessions) > 0 else "away", 'score': u[1]}, count=count_strategy(req.get('count', None), "cached")), 200
         except ValueError as e:
             data = e.args[0] if e.args and e.args[0] in ("page", "page_size") else "request"
             return jsonify({"error": _("invalid", data=_(data))}), 422
@@ -1442,7 +1508,8 @@ endpoints = {
         try:
             return (
                 paginate(
-                    "quizzes", query, req.get("page", None), req.get("page_size", None)
+                    "quizzes", query, req.get("page", None), req.get("page_size", None),
+                    count=count_strategy(req.get("count", None)),
                 ),
                 200,
             )
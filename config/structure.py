@@ -26,7 +26,9 @@ project_structure = {
             }
         },
         "test_models": {
+            "__init__.py": "",
             "test_engine": {
+                "__init__.py": "",
                 "test_db_storage.py": "",
                 "test_cache_storage.py": "",
             }
@@ -10,7 +10,7 @@ from api.v1.schemas.{section} import (
 )
 from models import storage, {tags}
 from models.base import time_fmt
-from models.engine.relational_storage import paginate
+from models.engine.relational_storage import count_strategy, paginate, paginate_cursor, preload
 
 {routes}"""
 
@@ -67,17 +67,25 @@ class {class_name}(Base, BaseModel):
 {deffered_rels}
 """
 
-models_import_template = """from models.engine.relational_storage import RelationalStorage
+models_import_template = """from os import getenv
+from models.engine.relational_storage import RelationalStorage
+from models.engine.cache_storage import CacheStorage
+from models.engine.table_stats import TableStats
 {models_import}
 from bcrypt import hashpw, gensalt
 
 classes = {{{classes}}}
 
 storage = RelationalStorage()
+if getenv("QQ_CACHE", "0") == "1":
+	storage = CacheStorage(storage)
 storage.reload()
 
 if storage.query(User).where(User.user_name == 'admin').one_or_none() is None:
 	admin = storage.new(User(email='admin@quizquickie.com', password=hashpw('admin'.encode(), gensalt()), user_name='admin')).save()
+storage.close()
+
+table_stats = TableStats(storage, float(getenv("QQ_STATS_TTL", 10)), getenv("QQ_STATS_APPROXIMATE", "0") == "1")
 """
 
 assoc_table_template = """
@@ -1,2 +1,3 @@
 INPUT_DIR='config'
 OUTPUT_DIR='dist'
+CACHE_DIR='.bbg_cache'
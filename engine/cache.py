@@ -0,0 +1,88 @@
+import os
+import glob
+import json
+import runpy
+import pickle
+import tempfile
+
+from engine import CACHE_DIR, INPUT_DIR
+from engine.manifest import digest, file_digest
+from engine.metrics import count
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generator_version():
+    """Hash the generator sources, any change to them invalidates the cached inputs"""
+    sources = sorted(glob.glob(os.path.join(ROOT, "engine", "*.py")) + glob.glob(os.path.join(ROOT, "utils", "*.py")))
+    return digest(*(file_digest(path) for path in sources))
+
+
+def output_version():
+    """Hash what every generated file depends on besides its own inputs: the
+    generator sources, the templates and the version and options of black"""
+    from engine.formatting import FORMAT_KEY
+
+    return digest(generator_version(), file_digest(os.path.join(ROOT, INPUT_DIR, "templates.py")), FORMAT_KEY)
+
+
+# values already loaded by this process, a watching generator keeps them between runs
+loaded = {}
+
+
+def cached(name, key, build):
+    """Load a pickled value saved under name if it was built for key, else build and save it"""
+    if name in loaded and loaded[name][0] == key:
+        count("input_cache_hits")
+        return loaded[name][1]
+    path = os.path.join(os.getcwd(), CACHE_DIR, "inputs", f"{name}.pickle")
+    try:
+        with open(path, "rb") as f:
+            cached_key, value = pickle.load(f)
+        if cached_key == key:
+            count("input_cache_hits")
+            loaded[name] = (key, value)
+            return value
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        pass
+
+    count("input_cache_misses")
+    value = build()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    loaded[name] = (key, value)
+    return value
+
+
+def load_spec(version):
+    """The compiled endpoints specification, only executed when it changed"""
+    from engine.spec import compile_spec
+
+    path = os.path.join(INPUT_DIR, "specification.py")
+    # run from source rather than imported, so that an edited specification is never stale
+    return cached("spec", digest(file_digest(path), version), lambda: compile_spec(runpy.run_path(path)["endpoints"]))
+
+
+def load_erd(project_name, version):
+    """The resolved ERD graph of the project, its indexes and loaders, only parsed when they changed"""
+    from engine.erd import build_graph
+
+    path = os.path.join(INPUT_DIR, project_name + ".erdplus")
+    indexes_path = os.path.join(INPUT_DIR, "indexes.py")
+    loaders_path = os.path.join(INPUT_DIR, "loaders.py")
+
+    def build():
+        with open(path, "rb") as f:
+            return build_graph(json.load(f), runpy.run_path(indexes_path)["indexes"], runpy.run_path(loaders_path)["loaders"])
+
+    key = digest(file_digest(path), file_digest(indexes_path), file_digest(loaders_path), version)
+    return cached(f"erd-{project_name}", key, build)
+
+
+def load_inputs(project_name):
+    """The compiled specification and ERD graph, from the cache when their sources are unchanged"""
+    version = generator_version()
+    return load_spec(version), load_erd(project_name, version)
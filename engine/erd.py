@@ -0,0 +1,123 @@
+from typing import NamedTuple
+
+from engine.manifest import digest
+
+LOADER_STRATEGIES = ("select", "selectin", "joined", "subquery", "immediate", "raise", "noload")
+
+
+class Column(NamedTuple):
+    """A table attribute, references is the id of the table a foreign key points to
+    and indexed whether the model indexes the column
+    """
+    name: str
+    data_type: str
+    size: str
+    primary_key: bool
+    optional: bool
+    unique: bool
+    references: int
+    indexed: bool
+
+
+class Table(NamedTuple):
+    """A table, association is the kind of link ('mm' or 'oo') of association tables
+    and loaders the (relationship attribute, loader strategy) pairs of its model
+    """
+    id: int
+    name: str
+    columns: tuple
+    association: str
+    loaders: tuple = ()
+
+    def loader(self, attribute):
+        """The default loader strategy of a relationship attribute of the model, None if lazy"""
+        return dict(self.loaders).get(attribute)
+
+
+class Relationship(NamedTuple):
+    """A link between two tables: 'mo' and 'om' for both ends of a foreign key,
+    'mm' and 'oo' for the tables joined by an association table
+    """
+    type: str
+    source: int
+    target: int
+
+
+class ErdGraph(NamedTuple):
+    """The tables of an ERD in document order, indexed by id with their relationships
+    and the hash of everything the model of each table is generated from
+    """
+    tables: tuple
+    tables_by_id: dict
+    relationships: dict
+    table_hashes: dict
+
+    def partition(self, parts):
+        """Split the tables into contiguous groups of table ids of about the same size"""
+        size = -(-len(self.tables) // max(parts, 1)) or 1
+        return [
+            tuple(table.id for table in self.tables[i:i + size])
+            for i in range(0, len(self.tables), size)
+        ] or [()]
+
+
+def parse_column(attr, indexed=()):
+    return Column(
+        name=attr["names"][0],
+        data_type=attr["dataType"],
+        size=attr["dataTypeSize"],
+        primary_key=attr["pkMember"],
+        optional=attr["optional"],
+        unique=attr["soloUnique"],
+        references=attr["references"][0]["tableId"] if attr["fk"] else None,
+        indexed=attr["names"][0] in indexed,
+    )
+
+
+def parse_table(details, indexes=None, loaders=None):
+    """Read a table shape, association tables are named '<table>-<table>-<mm|oo>'"""
+    name = details["name"]
+    association = None
+    if name.count("-") == 2:
+        name, association = name.rsplit("-", 1)
+    indexed = (indexes or {}).get(name, ())
+    table_loaders = tuple(sorted((loaders or {}).get(name, {}).items()))
+    for attribute, strategy in table_loaders:
+        if strategy not in LOADER_STRATEGIES:
+            raise ValueError(f"unknown loader strategy {strategy!r} for {name}.{attribute}, expected one of {', '.join(LOADER_STRATEGIES)}")
+    return Table(details["id"], name, tuple(parse_column(attr, indexed) for attr in details["attributes"]), association, table_loaders)
+
+
+def build_graph(data, indexes=None, loaders=None):
+    """Index the tables of an ERDPlus document and resolve their relationships in one pass,
+    indexes maps table names to the columns to index and loaders to the default loader
+    strategy of their relationships
+    """
+    tables = tuple(parse_table(shape["details"], indexes, loaders) for shape in data["shapes"] if shape["type"] == "Table")
+    tables_by_id = {table.id: table for table in tables}
+    relationships = {table.id: [] for table in tables}
+
+    for table in tables:
+        if table.association:
+            source, target = [column.references for column in table.columns if column.references is not None][:2]
+            if table.name.split("-")[0] != tables_by_id[source].name:
+                source, target = target, source
+            relationship = Relationship(table.association, source, target)
+            relationships[source].append(relationship)
+            relationships[target].append(relationship)
+            continue
+        for column in table.columns:
+            if column.references is not None:
+                relationships[column.references].append(Relationship("mo", column.references, table.id))
+                relationships[table.id].append(Relationship("om", table.id, column.references))
+
+    table_hashes = {}
+    for table in tables:
+        # a model is generated from its table, its relationships and the tables at their ends
+        linked = {table.id}
+        linked.update(column.references for column in table.columns if column.references is not None)
+        for relationship in relationships[table.id]:
+            linked.update((relationship.source, relationship.target))
+        table_hashes[table.id] = digest([tables_by_id[i] for i in sorted(linked)], relationships[table.id])
+
+    return ErdGraph(tables, tables_by_id, {k: tuple(v) for k, v in relationships.items()}, table_hashes)
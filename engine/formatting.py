@@ -0,0 +1,50 @@
+import os
+import time
+import hashlib
+import tempfile
+
+import black
+
+from engine import CACHE_DIR
+from engine.metrics import count
+
+MODE = black.Mode()
+FORMAT_KEY = f"{black.__version__}:{MODE.get_cache_key()}"
+
+enabled = True
+
+
+def cache_path(source):
+    key = hashlib.sha256(f"{FORMAT_KEY}\0{source}".encode()).hexdigest()
+    return os.path.join(os.getcwd(), CACHE_DIR, "format", key[:2], key)
+
+
+def store(path, formatted):
+    """Atomically save a formatted source, other workers may be writing it too"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as f:
+        f.write(formatted)
+    os.replace(tmp_path, path)
+
+
+def format_source(source, path="<string>"):
+    """Format python source in memory, reusing the result cached for the same content"""
+    if not enabled:
+        return source
+    start = time.perf_counter()
+    cached = cache_path(source)
+    try:
+        with open(cached) as f:
+            formatted = f.read()
+        count("format_cache_hits")
+    except FileNotFoundError:
+        count("format_cache_misses")
+        try:
+            formatted = black.format_str(source, mode=MODE)
+            store(cached, formatted)
+        except black.InvalidInput as e:
+            print(f"error: cannot format {path}: {e}")
+            formatted = source
+    count("format_seconds", time.perf_counter() - start)
+    return formatted
@@ -3,17 +3,16 @@ from utils.unquoted_string import _
 
 
 def filter_empty(json):
-    deleted = []
-    if isinstance(json, dict):
-        for k in json.keys():
-            v = json[k]
-            if isinstance(v, dict):
-                v = json[k] = filter_empty(v)
-            if len(v) == 0:
-                deleted.append(k)
-    for k in deleted:
-        del json[k]
-    return json    
+    """Copy a dict without its empty values, recursing into nested dicts"""
+    if not isinstance(json, dict):
+        return json
+    filtered = {}
+    for k, v in json.items():
+        if isinstance(v, dict):
+            v = filter_empty(v)
+        if len(v) != 0:
+            filtered[k] = v
+    return filtered
 
 
 def generate_json_schema(value, allow_additional=True):
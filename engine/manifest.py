@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+
+from engine import OUTPUT_DIR
+from engine.structure import create_file
+
+
+def digest(*inputs):
+    """Hash the representation of the given generator inputs"""
+    h = hashlib.sha256()
+    for value in inputs:
+        h.update(repr(value).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_digest(path):
+    """Hash the content of a file"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+MANIFEST_FILE = ".bbg_manifest.json"
+
+
+def manifest_path(project_name):
+    # kept inside the project so that removing the output also forgets what it contained
+    return os.path.join(os.getcwd(), OUTPUT_DIR, project_name, MANIFEST_FILE)
+
+
+class Manifest:
+    """Map each generator input to its hash and the files generated from it"""
+
+    def __init__(self, root, path, load=True):
+        self.root = root
+        self.path = path
+        self.previous = {}
+        self.entries = {}
+        if load and os.path.exists(path):
+            with open(path) as f:
+                self.previous = json.load(f)
+
+    def is_fresh(self, key, input_hash):
+        """Check that an input is unchanged and all of its outputs still exist"""
+        entry = self.previous.get(key)
+        if entry is None or entry["hash"] != input_hash:
+            return False
+        if not all(os.path.exists(os.path.join(self.root, p)) for p in entry["outputs"]):
+            return False
+        self.entries[key] = entry
+        return True
+
+    def record(self, key, input_hash, outputs):
+        """Register the outputs emitted for an input"""
+        self.entries[key] = {
+            "hash": input_hash,
+            "outputs": sorted(os.path.relpath(p, self.root) for p in outputs),
+        }
+
+    def merge(self, other):
+        """Merge the entries recorded by another copy of the manifest"""
+        if other is self:
+            return
+        self.entries.update(other.entries)
+
+    def stale_outputs(self):
+        """Files generated by a previous run that no input produces anymore"""
+        current = {p for entry in self.entries.values() for p in entry["outputs"]}
+        previous = {p for entry in self.previous.values() for p in entry["outputs"]}
+        return [os.path.join(self.root, p) for p in sorted(previous - current)]
+
+    def save(self):
+        create_file(self.path, json.dumps(self.entries, indent=2, sort_keys=True))
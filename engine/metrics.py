@@ -0,0 +1,20 @@
+"""Counters the generator stages report back to the scheduler
+"""
+counters = {}
+
+
+def count(name, amount=1):
+    """Add an amount to a counter of the running stage"""
+    counters[name] = counters.get(name, 0) + amount
+
+
+def collect():
+    """Return the counters of the running stage and reset them"""
+    snapshot = dict(counters)
+    counters.clear()
+    return snapshot
+
+
+def total(stage_metrics, name):
+    """Sum a counter over the metrics of all stages"""
+    return sum(metrics.get(name, 0) for metrics in stage_metrics.values())
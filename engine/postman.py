@@ -1,6 +1,9 @@
 import json
+from itertools import groupby
 import requests as rs
 
+from engine.metrics import count
+
 # Helper function to create a Postman request
 def create_request(method, path, desc, request_body=None, response_schema=None):
     request = {
@@ -39,7 +42,7 @@ def create_request(method, path, desc, request_body=None, response_schema=None):
         })
     return request
 
-def generate_postman_collection(project_name, endpoints, save_to_account=True):
+def generate_postman_collection(project_name, spec, save_to_account=True):
     # Initialize an empty Postman collection
     collection = {
         "info": {
@@ -50,23 +53,22 @@ def generate_postman_collection(project_name, endpoints, save_to_account=True):
     }
 
     # Loop through the spec to add each path/method to the collection
-    for category, paths in endpoints.items():
+    for section in spec:
         category_folder = {
-            "name": category,
+            "name": section.name,
             "item": []
         }
-        for path, methods in paths.items():
+        for path, path_endpoints in groupby(section.endpoints, key=lambda endpoint: endpoint.path):
             folder = {
                 "name": path[8:],
                 "item": []
             }
 
-            for method, details in methods.items():
-                request_body = details.get("request", {})
-                response_schema = details.get("responses", {}).get("OK", {})
+            for endpoint in path_endpoints:
+                response_schema = endpoint.responses.get("OK", {})
 
                 # Add request to the folder
-                folder["item"].append(create_request(method, path, details["desc"], request_body, response_schema))
+                folder["item"].append(create_request(endpoint.method, path, endpoint.desc, endpoint.request, response_schema))
 
             # Add folder to the collection
             category_folder["item"].append(folder)
@@ -75,6 +77,7 @@ def generate_postman_collection(project_name, endpoints, save_to_account=True):
         
     if save_to_account:
         postman_api_key = open('postman_api.key').readline()[:-1]
+        count("http_requests")
         response = rs.post(
             "https://api.getpostman.com/collections",
             headers={"X-Api-Key": postman_api_key, "Content-Type": "application/json"},
@@ -153,6 +156,7 @@ def generate_postman_test_collection(project_name, tests, save_to_account=True):
 
     if save_to_account:
         postman_api_key = open('postman_api.key').readline()[:-1]
+        count("http_requests")
         response = rs.post(
             "https://api.getpostman.com/collections",
             headers={"X-Api-Key": postman_api_key, "Content-Type": "application/json"},
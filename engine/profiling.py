@@ -0,0 +1,56 @@
+import os
+import json
+import pstats
+
+
+def stage_report(stage_metrics, run_seconds):
+    """Tabulate the timings and counters reported by each stage"""
+    columns = ("wall", "cpu", "sub cpu", "format", "emitted", "written", "bytes", "subproc", "http")
+    lines = [f"{'stage':<14}" + "".join(f"{c:>10}" for c in columns)]
+    for name, m in sorted(stage_metrics.items(), key=lambda item: item[1]["start"]):
+        lines.append(
+            f"{name:<14}"
+            f"{m['wall_seconds']:>9.3f}s"
+            f"{m['cpu_seconds']:>9.3f}s"
+            f"{m['subprocess_cpu_seconds']:>9.3f}s"
+            f"{m.get('format_seconds', 0):>9.3f}s"
+            f"{m.get('files_emitted', 0):>10}"
+            f"{m.get('files_written', 0):>10}"
+            f"{m.get('bytes_written', 0):>10}"
+            f"{m.get('subprocesses', 0):>10}"
+            f"{m.get('http_requests', 0):>10}"
+        )
+    lines.append(f"total wall time {run_seconds:.3f}s")
+    return "\n".join(lines)
+
+
+def write_trace(path, stage_metrics, run_start, run_seconds):
+    """Save the stages as Chrome trace events, to be opened in chrome://tracing or Perfetto"""
+    events = [
+        {"name": "generate", "ph": "X", "pid": os.getpid(), "tid": os.getpid(), "ts": run_start * 1e6, "dur": run_seconds * 1e6},
+    ]
+    for name, m in stage_metrics.items():
+        events.append({
+            "name": name,
+            "cat": "stage",
+            "ph": "X",
+            "pid": m["pid"],
+            "tid": m["pid"],
+            "ts": m["start"] * 1e6,
+            "dur": m["wall_seconds"] * 1e6,
+            "args": {k: v for k, v in m.items() if k not in ("pid", "start")},
+        })
+    for pid in {m["pid"] for m in stage_metrics.values()} | {os.getpid()}:
+        label = "bbg" if pid == os.getpid() else f"worker {pid}"
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label}})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def merge_profiles(profile_dir, path):
+    """Merge the cProfile dumps of every stage into a single stats file"""
+    dumps = sorted(os.path.join(profile_dir, name) for name in os.listdir(profile_dir) if name.endswith(".prof"))
+    if not dumps:
+        return
+    stats = pstats.Stats(*dumps)
+    stats.dump_stats(path)
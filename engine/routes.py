@@ -1,42 +1,40 @@
 import os
-import re
 
-from werkzeug.routing import Rule, Map
-
-from engine.jsonschemas import generate_json_schema
-from utils.http_constants import *
 from config.templates import route_template, routes_file_template, routes_import_template, schema_template
 from engine.structure import create_file
-from utils.unquoted_string import _
-
+from engine.cache import output_version
+from engine.manifest import digest
 
-def route_handler_name(path, method):
-    method_er = {GET: "getter", POST: "poster", PUT: "putter", PATCH: "patcher", DELETE: "deleter"}
+TEMPLATES_HASH = digest(route_template, routes_file_template, schema_template, output_version())
 
-    route_handler = path[8:] if path.startswith("/api/v1") else path
-    route_handler = re.sub(r"/<[^>]+>", "_one", route_handler).replace("/", "_")
-    route_handler += f"_{method_er[method]}"
 
-    return route_handler
+def preload_options(preload):
+    """The expression of the loader options of the (model, path, strategy) triples of an endpoint"""
+    by_model = {}
+    for model, path, strategy in preload:
+        by_model.setdefault(model, {})[path] = strategy
+    return " + ".join(f"preload({model}, {paths!r})" for model, paths in by_model.items())
 
 
-def generate_route_function(
-    path: str, section, route_handler, method, desc, request, responses, pagination=None, snippet=None
-):
+def generate_route_function(endpoint):
     """Generate route functions based on path, method, and response codes, with response stubs for each"""
-    rule_matcher = Rule(path, endpoint=route_handler)
-    rule_matcher.bind(Map())
-    params = ", ".join(rule_matcher.arguments)
-    route_code = route_template.format(path=path, desc=desc, route_path=path[7:], method=method, section=section, route_handler=route_handler, route_handler_upper=route_handler.upper(), params=params, errors=', '.join(str(err) for err in sorted(responses) if str(err)[0] != '2'))
+    path, section, route_handler, method, desc = endpoint.path, endpoint.section, endpoint.handler, endpoint.method, endpoint.desc
+    request, responses, pagination, snippet = endpoint.request, endpoint.responses, endpoint.pagination, endpoint.snippet
+    params = ", ".join(endpoint.url_args)
+    route_code = [route_template.format(path=path, desc=desc, route_path=path[7:], method=method, section=section, route_handler=route_handler, route_handler_upper=route_handler.upper(), params=params, errors=', '.join(str(err) for err in sorted(responses) if str(err)[0] != '2'))]
+    if endpoint.preload:
+        # resolved once at import, the handler applies them to its base query with .options(*PRELOAD)
+        route_code.insert(0, f"\n{route_handler.upper()}_PRELOAD = {preload_options(endpoint.preload)}\n")
+        route_code.append(f"    PRELOAD = {route_handler.upper()}_PRELOAD\n")
     if snippet is not None:
-        route_code += "\n" + snippet + '\n\n'
-        return route_code
+        route_code.append("\n" + snippet + '\n\n')
+        return "".join(route_code)
 
-    route_code += """
+    route_code.append("""
     user: User = getattr(g, 'user', None)
     if user is None:
         return jsonify({'error': _('unauthorized')}), 401
-"""
+""")
     type_interpreter = {
         "int": lambda e: f'int({e})',
         "float": lambda e: f'float({e})',
@@ -47,118 +45,99 @@ def generate_route_function(
     for k, v in request.items():
         if k.endswith("?"):
             k = k.strip("?")
-            route_code += f"    {k} = {type_interpreter[v](f"req['{k}']") if isinstance(v, str) else f'req.get(\'{k}\', None)'} if req.get('{k}', None) else None\n"
+            route_code.append(f"    {k} = {type_interpreter[v](f"req['{k}']") if isinstance(v, str) else f'req.get(\'{k}\', None)'} if req.get('{k}', None) else None\n")
         else:
-            route_code += f"    {k} = {type_interpreter[v](f"req['{k}']") if isinstance(v, str) else f'req[\'{k}\']'}\n"
+            route_code.append(f"    {k} = {type_interpreter[v](f"req['{k}']") if isinstance(v, str) else f'req[\'{k}\']'}\n")
 
 
     # Generate response stubs for each status code
-    route_code += "\n    try:\n"
+    route_code.append("\n    try:\n")
     for status, status_responses in responses.items():
         status_code = int(status)  # Default to the status as is (if numeric)
 
         # Add the responses for this status code
         for response in status_responses:
-            route_code += f"        if False:  # Stub for {status_code} response\n"
-            route_code += f"            return jsonify({response}), {status_code}\n"
+            route_code.append(f"        if False:  # Stub for {status_code} response\n")
+            route_code.append(f"            return jsonify({response}), {status_code}\n")
 
     if pagination:
-        route_code += f"""
-        query = storage.query()
-        return paginate("{pagination}", query, page, page_size, lambda u: u), 200
-    except ValueError as e:
-        data = e.args[0] if e.args and e.args[0] in ("page", "page_size") else "request"
+        route_code.append(f"""
+        query = storage.query(){'.options(*PRELOAD)' if endpoint.preload else ''}
+""")
+        count = f'count_strategy(count, "{endpoint.pagination_count}")'
+        match endpoint.pagination_mode:
+            case "page":
+                route_code.append(f"""        return paginate("{pagination}", query, page, page_size, lambda u: u, count={count}), 200
+""")
+            case "cursor":
+                route_code.append(f"""        return paginate_cursor("{pagination}", query, None, after, before, page_size, lambda u: u), 200
+""")
+            case "both":
+                # page numbers unless a cursor is given, the pages then also carry a cursor to switch with
+                route_code.append(f"""        if after is None and before is None:
+            return paginate("{pagination}", query, page, page_size, lambda u: u, cursor=True, count={count}), 200
+        return paginate_cursor("{pagination}", query, None, after, before, page_size, lambda u: u), 200
+""")
+        invalid = ("page", "page_size") if endpoint.pagination_mode == "page" else ("page", "page_size", "cursor")
+        route_code.append(f"""    except ValueError as e:
+        data = e.args[0] if e.args and e.args[0] in {invalid} else "request"
         return jsonify({{"error": _("invalid", data=_(data))}}), 422
-"""
-    route_code += """    except Exception as e:
+""")
+    route_code.append("""    except Exception as e:
         print(f'[{e.__class__.__name__}]: {e}')
         abort(500)
 
-"""
-    return route_code
+""")
+    return "".join(route_code)
 
 
-def generate_routes(project_name, endpoints):
-    """Generate all the routes from the endpoints"""
+def generate_routes(project_name, spec, manifest=None):
+    """Generate all the routes from the compiled specification"""
     base_path = os.path.join(os.getcwd(), project_name)
-    for section, paths in endpoints.items():
-        routes = ""
+    for section in spec:
+        routes_file_path = os.path.join(
+            base_path, "api", "v1", "routes", section.name + ".py"
+        )
+        schemas_file_path = os.path.join(
+            base_path, "api", "v1", "schemas", section.name + ".py"
+        )
+        section_hash = digest(section.hash, TEMPLATES_HASH)
+        if manifest is not None and manifest.is_fresh(f"routes:{section.name}", section_hash):
+            continue
+
+        routes = []
         schemas = {}
         section_tags = []
-        for path, methods in paths.items():
-            for method, details in methods.items():
-                request = details.get("request", {})
-                responses = details.get("responses", {})
-                desc = details.get("desc", "")
-                snippet = details.get("snippet", None)
-                pagination = details.get("pagination", None)
-                tags = details.get('tags', [])
-                section_tags.extend(tags)
-
-                if pagination:
-                    request.update(
-                        {"page?": "int", "page_size?": "int", "query?": "str"}
-                    )
-                    responses[OK] = {
-                        "total_pages": "int",
-                        f"total_{pagination}": "int",
-                        "next": "int",
-                        "prev": "int",
-                        pagination: [responses[OK]],
-                    }
-                    responses.update(
-                        {
-                            UNPROCESSABLE_ENTITY: {
-                                "error": _("_('invalid', data=_('page'))")
-                            },
-                            UNPROCESSABLE_ENTITY: {
-                                "error": _("_('invalid', data=_('page_size'))")
-                            },
-                        }
-                    )
-
-                route_handler = route_handler_name(path, method)
-                routes += generate_route_function(
-                    path,
-                    section,
-                    route_handler,
-                    method,
-                    desc,
-                    request,
-                    responses,
-                    pagination,
-                    snippet,
-                )
-                schemas[f"{route_handler.upper()}_SCHEMA"] = repr(
-                    generate_json_schema(request)
-                )
+        for endpoint in section.endpoints:
+            section_tags.extend(endpoint.tags)
+            section_tags.extend(model for model, _, _ in endpoint.preload)
+            routes.append(generate_route_function(endpoint))
+            schemas[f"{endpoint.handler.upper()}_SCHEMA"] = repr(endpoint.request_schema)
 
-        routes_file_path = os.path.join(
-            base_path, "api", "v1", "routes", section + ".py"
-        )
         create_file(
             routes_file_path,
             routes_file_template.format(
-                routes=routes, section=section, schemas=",\n    ".join(schemas.keys()), tags=', '.join(sorted(set(section_tags + ['User'])))
+                routes="".join(routes), section=section.name, schemas=",\n    ".join(schemas.keys()), tags=', '.join(sorted(set(section_tags + ['User'])))
             ),
         )
-
-        schemas_file_path = os.path.join(
-            base_path, "api", "v1", "schemas", section + ".py"
-        )
         create_file(
             schemas_file_path,
             schema_template.format(
-                section=section,
+                section=section.name,
                 schemas="\n".join(f"{k} = {v}" for k, v in schemas.items()),
             ),
         )
-    create_routes_init_file(project_name, list(endpoints.keys()))
+        if manifest is not None:
+            manifest.record(f"routes:{section.name}", section_hash, [routes_file_path, schemas_file_path])
+    create_routes_init_file(project_name, [section.name for section in spec], manifest)
 
 
-def create_routes_init_file(project_name, section_names):
+def create_routes_init_file(project_name, section_names, manifest=None):
+    init_file_path = os.path.join(os.getcwd(), project_name, "api", "v1", "routes", "__init__.py")
+    init_hash = digest(section_names, routes_import_template, TEMPLATES_HASH)
+    if manifest is not None and manifest.is_fresh("routes:__init__", init_hash):
+        return
     routes_init_file = routes_import_template.format(routes_import='\n'.join(f'from api.v1.routes.{section} import *' for section in section_names))
-    create_file(
-        os.path.join(os.getcwd(), project_name, "api", "v1", "routes", "__init__.py"),
-        routes_init_file,
-    )
+    create_file(init_file_path, routes_init_file)
+    if manifest is not None:
+        manifest.record("routes:__init__", init_hash, [init_file_path])
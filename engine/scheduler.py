@@ -0,0 +1,131 @@
+import os
+import time
+import cProfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from engine import metrics, vfs
+
+
+class Stage:
+    """A generator stage, the stages it must follow and an optional run condition"""
+
+    def __init__(self, name, func, *args, after=(), when=None):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.after = tuple(after)
+        self.when = when
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, after={self.after!r})"
+
+
+def check_stages(stages):
+    """Make sure every dependency exists and that the stages form no cycle"""
+    names = {stage.name for stage in stages}
+    if len(names) != len(stages):
+        raise ValueError("duplicate stage names")
+    for stage in stages:
+        missing = set(stage.after) - names
+        if missing:
+            raise ValueError(f"stage {stage.name!r} depends on unknown stages: {', '.join(sorted(missing))}")
+
+    done = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if done.issuperset(stage.after)]
+        if not ready:
+            raise ValueError(f"cyclic stage dependencies: {', '.join(s.name for s in remaining)}")
+        done.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in done]
+
+
+def ready_stages(pending, results):
+    """Pop the pending stages whose dependencies have all finished"""
+    ready = [stage for stage in pending.values() if all(dep in results for dep in stage.after)]
+    for stage in ready:
+        del pending[stage.name]
+    return ready
+
+
+def run_stage(name, func, args, profile_dir=None):
+    """Run a stage function, returning its result and the counters it reported
+    along with its timings, optionally dumping its cProfile stats to profile_dir
+    """
+    metrics.collect()
+    profiler = cProfile.Profile() if profile_dir else None
+    children = os.times()
+    start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        if profiler:
+            profiler.disable()
+    counters = metrics.collect()
+    counters.update(
+        pid=os.getpid(),
+        start=start,
+        wall_seconds=time.perf_counter() - wall,
+        cpu_seconds=time.process_time() - cpu,
+        subprocess_cpu_seconds=sum(os.times()[2:4]) - sum(children[2:4]),
+    )
+    if profiler:
+        profiler.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+    return result, counters
+
+
+def run_worker_stage(name, func, args, profile_dir=None):
+    """Run a stage in a worker process, also returning the output tree it emitted"""
+    vfs.collect()
+    result, counters = run_stage(name, func, args, profile_dir)
+    return result, counters, vfs.collect()
+
+
+def run_stages(stages, workers=None, profile_dir=None):
+    """Run the stages, starting each one as soon as the stages it follows are done
+
+    Independent stages run concurrently in a process pool of `workers` processes,
+    a single worker runs them one after another in the current process.
+    With a profile_dir every stage is run under cProfile and dumps its stats there.
+    The files emitted by the workers are merged into the output tree of the current
+    process in the order of the stages, so later stages override earlier ones.
+    Return two dicts mapping each stage name to its result (None if it was skipped)
+    and to the counters it reported.
+    """
+    check_stages(stages)
+    pending = {stage.name: stage for stage in stages}
+    results = {}
+    stage_metrics = {}
+
+    def should_run(stage):
+        if stage.when is None or stage.when(results):
+            return True
+        results[stage.name] = None
+        return False
+
+    if workers == 1:
+        while pending:
+            for stage in ready_stages(pending, results):
+                if should_run(stage):
+                    results[stage.name], stage_metrics[stage.name] = run_stage(stage.name, stage.func, stage.args, profile_dir)
+        return results, stage_metrics
+
+    trees = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            for stage in ready_stages(pending, results):
+                if should_run(stage):
+                    running[pool.submit(run_worker_stage, stage.name, stage.func, stage.args, profile_dir)] = stage.name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], stage_metrics[name], trees[name] = future.result()
+    for stage in stages:
+        if stage.name in trees:
+            vfs.tree.merge(trees[stage.name])
+    return results, stage_metrics
@@ -0,0 +1,181 @@
+import re
+import copy
+from typing import NamedTuple
+
+from engine.jsonschemas import generate_json_schema
+from engine.cache import generator_version
+from engine.manifest import digest
+from utils.http_constants import *
+from utils.unquoted_string import _
+
+# the sections also depend on the json schemas and the helpers of utils
+SOURCE_HASH = generator_version()
+
+URL_ARGUMENT = re.compile(r"<(?:[^<>:]+:)?([^<>:]+)>")
+
+PAGINATION_MODES = ("page", "cursor", "both")
+PAGINATION_COUNTS = ("exact", "cached", "estimated")
+PRELOAD_STRATEGIES = ("selectin", "joined", "subquery", "immediate")
+
+
+class Endpoint(NamedTuple):
+    """A path and method of the specification with everything the emitters derive from it
+
+    request and responses include the pagination fields, they are private copies of
+    the specification and must be treated as read-only like the schemas, pagination
+    is the name of the paginated items, pagination_mode one of PAGINATION_MODES and
+    pagination_count one of PAGINATION_COUNTS, preload holds the (model, relationship path,
+    loader strategy) triples the handler loads its base query with
+    """
+    section: str
+    path: str
+    method: str
+    handler: str
+    desc: str
+    tags: tuple
+    url_args: tuple
+    request: dict
+    responses: dict
+    has_request: bool
+    pagination: str
+    pagination_mode: str
+    pagination_count: str
+    preload: tuple
+    snippet: str
+    request_schema: dict
+    response_schemas: dict
+
+
+class Section(NamedTuple):
+    """The endpoints of a section, hash identifies the specification they came from"""
+    name: str
+    hash: str
+    endpoints: tuple
+
+
+def route_handler_name(path, method):
+    method_er = {GET: "getter", POST: "poster", PUT: "putter", PATCH: "patcher", DELETE: "deleter"}
+
+    route_handler = path[8:] if path.startswith("/api/v1") else path
+    route_handler = re.sub(r"/<[^>]+>", "_one", route_handler).replace("/", "_")
+    route_handler += f"_{method_er[method]}"
+
+    return route_handler
+
+
+def url_arguments(path):
+    """The names of the arguments of a URL rule, in the order they appear in the path"""
+    # only needed on a cache miss, unpickling the IR should not pay for importing werkzeug
+    from werkzeug.routing import Rule, Map
+
+    rule = Rule(path)
+    rule.bind(Map())
+    names = tuple(URL_ARGUMENT.findall(path))
+    if set(names) != rule.arguments:
+        raise ValueError(f"cannot parse the arguments of {path!r}")
+    return names
+
+
+def pagination_settings(details):
+    """Get the paginated items name, pagination mode and count strategy of an
+    endpoint, the "pagination" key is either the items name, paginated by page
+    number with exact counts, or a dict of the items name, the mode and the count
+    """
+    pagination = details.get("pagination", None)
+    if not isinstance(pagination, dict):
+        return pagination, "page" if pagination else None, "exact" if pagination else None
+    mode = pagination.get("mode", "page")
+    if mode not in PAGINATION_MODES:
+        raise ValueError(f"unknown pagination mode {mode!r}, expected one of {', '.join(PAGINATION_MODES)}")
+    count = pagination.get("count", "exact")
+    if count not in PAGINATION_COUNTS:
+        raise ValueError(f"unknown pagination count {count!r}, expected one of {', '.join(PAGINATION_COUNTS)}")
+    return pagination["items"], mode, count
+
+
+def preload_settings(details):
+    """Get the relationships an endpoint loads eagerly, the "preload" key is either a
+    list of "Model.relationship[.relationship...]" paths, loaded with selectin, or a dict
+    of those paths and their loader strategy
+    """
+    preload = details.get("preload", {})
+    if not isinstance(preload, dict):
+        preload = dict.fromkeys(preload, "selectin")
+    settings = []
+    for path, strategy in preload.items():
+        if "." not in path.strip("."):
+            raise ValueError(f"preload path {path!r} names no relationship of its model")
+        model, relationships = path.split(".", 1)
+        if strategy not in PRELOAD_STRATEGIES:
+            raise ValueError(f"unknown preload strategy {strategy!r}, expected one of {', '.join(PRELOAD_STRATEGIES)}")
+        settings.append((model, relationships, strategy))
+    return tuple(settings)
+
+
+def expand_pagination(details):
+    """Get the request and responses of an endpoint with the pagination fields added"""
+    request = dict(details.get("request", {}))
+    responses = dict(details.get("responses", {}))
+    pagination, mode, count = pagination_settings(details)
+
+    if pagination:
+        if mode != "cursor":
+            request.update({"page?": "int", "count?": "str"})
+        if mode != "page":
+            request.update({"after?": "str", "before?": "str"})
+        request.update({"page_size?": "int", "query?": "str"})
+        ok = {}
+        if mode != "cursor":
+            ok.update({
+                "total_pages?": "int",
+                f"total_{pagination}?": "int",
+                "count": "str",
+                "next": "int",
+                "prev": "int",
+            })
+        if mode != "page":
+            ok.update({"next_cursor?": "str", "prev_cursor?": "str"})
+        ok[pagination] = [responses[OK]]
+        responses[OK] = ok
+        responses[UNPROCESSABLE_ENTITY] = {
+            "error": _("_('invalid', data=_('page_size'))")
+        }
+    return request, responses
+
+
+def compile_endpoint(section, path, method, details, url_args):
+    details = copy.deepcopy(details)
+    request, responses = expand_pagination(details)
+    pagination, pagination_mode, pagination_count = pagination_settings(details)
+    return Endpoint(
+        section=section,
+        path=path,
+        method=method,
+        handler=route_handler_name(path, method),
+        desc=details.get("desc", ""),
+        tags=tuple(details.get("tags", ())),
+        url_args=url_args,
+        request=request,
+        responses=responses,
+        has_request="request" in details,
+        pagination=pagination,
+        pagination_mode=pagination_mode,
+        pagination_count=pagination_count,
+        preload=preload_settings(details),
+        snippet=details.get("snippet", None),
+        request_schema=generate_json_schema(request),
+        response_schemas={code: generate_json_schema(response) for code, response in responses.items()},
+    )
+
+
+def compile_spec(endpoints):
+    """Compile the endpoints specification into a tuple of sections in a single pass"""
+    sections = []
+    for section, paths in endpoints.items():
+        compiled = []
+        for path, methods in paths.items():
+            url_args = url_arguments(path)
+            for method, details in methods.items():
+                compiled.append(compile_endpoint(section, path, method, details, url_args))
+        sections.append(Section(section, digest(section, paths, SOURCE_HASH), tuple(compiled)))
+    return tuple(sections)
@@ -3,12 +3,19 @@ import requests as rs
 
 from config.translations import LANGUAGES
 from engine import OUTPUT_DIR
+from engine.metrics import count
+
+
+def system(command):
+    """Run a shell command, counting it in the stage metrics"""
+    count("subprocesses")
+    return os.system(command)
 
 
 def generate_translations(project_name):
 
     base_path = os.path.join(os.getcwd(), OUTPUT_DIR, project_name, "api", "v1")
-    os.system(f"pybabel extract -F {os.path.join(base_path, "babel.cfg")} -k _l -o {os.path.join(base_path, "messages.pot")} .")
+    system(f"pybabel extract -F {os.path.join(base_path, "babel.cfg")} -k _l -o {os.path.join(base_path, "messages.pot")} .")
 
     lines = []
 
@@ -18,7 +25,7 @@ def generate_translations(project_name):
         trans = os.path.join(base_path, "translations")
         lang_po = os.path.join(trans, lang, "LC_MESSAGES", "messages.po")
 
-        os.system(f"pybabel init -i {os.path.join(base_path, "messages.pot")} -d {trans} -l {lang}")
+        system(f"pybabel init -i {os.path.join(base_path, "messages.pot")} -d {trans} -l {lang}")
 
         with open(lang_po) as f:
             lines = f.readlines()
@@ -30,6 +37,7 @@ def generate_translations(project_name):
             ids, texts = zip(*msgs)
         rapidapi_key = open("rapidapi.key").readline().strip()
         payload = {"sl": "auto", "tl": lang, "texts": [text for text in texts if text]}
+        count("http_requests")
         response = rs.post(
             "https://ai-translate.p.rapidapi.com/translate",
             headers={
@@ -47,5 +55,7 @@ def generate_translations(project_name):
 
         with open(lang_po, "w", encoding="utf-8") as f:
             f.writelines(lines)
+        count("files_written")
+        count("bytes_written", sum(len(line.encode()) for line in lines))
 
-    os.system(f"pybabel compile -d {trans}")
+    system(f"pybabel compile -d {trans}")
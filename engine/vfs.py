@@ -0,0 +1,129 @@
+import os
+import difflib
+
+from engine.metrics import count
+
+
+class OutputTree:
+    """In-memory output files that are written to disk in one batched flush"""
+
+    def __init__(self):
+        self.files = {}
+        self.dirs = set()
+        self.removed = set()
+
+    def write(self, path, content):
+        """Set the content of an output file"""
+        if isinstance(content, str):
+            content = content.encode()
+        self.files[path] = content
+        self.removed.discard(path)
+        count("files_emitted")
+        count("bytes_emitted", len(content))
+        return path
+
+    def makedirs(self, path):
+        """Declare a directory that must exist even if no file is written in it"""
+        self.dirs.add(path)
+
+    def remove(self, path):
+        """Delete an output file when the tree is flushed"""
+        self.files.pop(path, None)
+        self.removed.add(path)
+
+    def exists(self, path):
+        return path in self.files or (path not in self.removed and os.path.exists(path))
+
+    def merge(self, other):
+        """Apply the writes and removals of another tree over this one"""
+        for path in other.removed:
+            self.remove(path)
+        self.files.update(other.files)
+        self.removed.difference_update(other.files)
+        self.dirs.update(other.dirs)
+
+    def prune(self, root):
+        """Remove every file under root that the tree does not contain"""
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if path not in self.files:
+                    self.removed.add(path)
+
+    def changes(self):
+        """List the (path, old content, new content) of the files that differ from disk,
+        with None as the content of missing or removed files
+        """
+        changes = []
+        for path in sorted(self.removed):
+            if os.path.isfile(path):
+                changes.append((path, read_bytes(path), None))
+        for path, content in sorted(self.files.items()):
+            old = read_bytes(path) if os.path.isfile(path) else None
+            if old != content:
+                changes.append((path, old, content))
+        return changes
+
+    def flush(self, changes=None):
+        """Write the changed files to disk atomically, leaving the unchanged ones untouched"""
+        if changes is None:
+            changes = self.changes()
+        dirs = set(self.dirs)
+        dirs.update(os.path.dirname(path) for path, _, content in changes if content is not None)
+        for path in sorted(dirs):
+            os.makedirs(path, exist_ok=True)
+
+        for path, _, content in changes:
+            if content is None:
+                os.remove(path)
+                continue
+            # write next to the target so the rename stays on the same filesystem
+            tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            count("files_written")
+            count("bytes_written", len(content))
+
+        for dirpath in {os.path.dirname(path) for path, _, content in changes if content is None}:
+            while dirpath not in dirs and os.path.isdir(dirpath) and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+                dirpath = os.path.dirname(dirpath)
+        return changes
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def diff(changes, root=""):
+    """Render changes as a unified diff relative to root"""
+    lines = []
+    for path, old, new in changes:
+        name = os.path.relpath(path, root) if root else path
+        try:
+            old_lines = old.decode().splitlines(keepends=True) if old is not None else []
+            new_lines = new.decode().splitlines(keepends=True) if new is not None else []
+        except UnicodeDecodeError:
+            lines.append(f"Binary file {name} differs\n")
+            continue
+        lines.extend(difflib.unified_diff(
+            old_lines,
+            new_lines,
+            "/dev/null" if old is None else f"a/{name}",
+            "/dev/null" if new is None else f"b/{name}",
+        ))
+    return "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+
+
+# the tree the current process emits into, worker processes send theirs back to the scheduler
+tree = OutputTree()
+
+
+def collect():
+    """Return the tree of the current process and start a new one"""
+    global tree
+    collected, tree = tree, OutputTree()
+    return collected
@@ -0,0 +1,132 @@
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+EVENT = struct.Struct("iIII")
+
+# editors save in bursts of events, they are gathered until the files settle for this long
+SETTLE_SECONDS = 0.05
+
+
+def ignored(path):
+    """Whether a path is a cache or an editor's temporary file"""
+    name = os.path.basename(path)
+    return "__pycache__" in path.split(os.sep) or name.startswith(".") or name.endswith(("~", ".swp", ".swx", ".tmp"))
+
+
+class InotifyWatcher:
+    """Wait for changes in directory trees with the Linux inotify API"""
+
+    kind = "inotify"
+
+    def __init__(self, roots):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not ignored(os.path.join(dirpath, name))]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = dirpath
+
+    def read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+            offset += EVENT.size + length
+            if wd not in self.dirs:
+                continue
+            path = os.path.join(self.dirs[wd], os.fsdecode(name))
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(path)
+            if not ignored(path):
+                changed.add(path)
+        return changed
+
+    def wait(self):
+        """Block until files change, return the paths that changed"""
+        changed = set()
+        while not changed:
+            select.select([self.fd], [], [])
+            changed |= self.read_events()
+        while select.select([self.fd], [], [], SETTLE_SECONDS)[0]:
+            changed |= self.read_events()
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Wait for changes in directory trees by comparing their file stats periodically"""
+
+    kind = "polling"
+
+    def __init__(self, roots, interval=0.25):
+        self.roots = roots
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        stats = {}
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [name for name in dirnames if not ignored(os.path.join(dirpath, name))]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if ignored(path):
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    stats[path] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def wait(self):
+        """Block until files change, return the paths that changed"""
+        while True:
+            time.sleep(self.interval)
+            snapshot = self.scan()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys() if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+def watcher(roots):
+    """Watch the roots with inotify where the platform has it, else by polling"""
+    try:
+        return InotifyWatcher(roots)
+    except (OSError, AttributeError):  # no inotify in libc, or out of inotify instances
+        return PollingWatcher(roots)
@@ -2,12 +2,15 @@
 """Route module for the API
 """
 from os import getenv
-from flask import Flask, jsonify, abort, request, g
+from flask import Flask, jsonify, abort, request, g, make_response
 from flask_cors import CORS
 from flask_babel import Babel, _
 from flasgger import Swagger
 from api.v1.routes import app_routes
-from api.v1.auth import auth, require_auth
+from api.v1.auth import auth
+from api.v1.auth.route_matcher import RouteMatcher
+from api.v1.auth.session_sweeper import start_session_sweeper
+from api.v1.password_hashing import HasherBusy, hasher
 from config import Config
 from models import storage
 
@@ -16,6 +19,18 @@ app = Flask(__name__)
 app.register_blueprint(app_routes)
 app.config.from_object(Config)
 
+# compiled once, auth_handler runs before every request
+unprotected_routes = RouteMatcher(app.config["UNPROTECTED_ROUTES"])
+
+# the password hashing workers are forked while this is the only thread
+hasher.start()
+
+# deletes the expired sessions every SESSION_SWEEP_INTERVAL seconds
+session_sweeper = start_session_sweeper()
+
+# stage the storage changes of each request and commit them once it succeeded
+unit_of_work = getenv("QQ_UNIT_OF_WORK", "0") == "1"
+
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 Swagger(app)
 
@@ -46,13 +61,30 @@ def close_connection(s):
     storage.close()
 
 
+@app.before_request
+def begin_unit_of_work():
+    """Stage the storage changes of the request"""
+    if unit_of_work:
+        storage.begin_unit_of_work()
+
+
+@app.after_request
+def end_unit_of_work(response):
+    """Commit the staged changes of a successful request, roll back the others"""
+    if not unit_of_work:
+        return response
+    try:
+        storage.end_unit_of_work(commit=response.status_code < 400)
+    except Exception as e:
+        print(f"[{e.__class__.__name__}]: {e}")
+        return make_response(jsonify({'error': _('unexpected')}), 500)
+    return response
+
+
 @app.before_request
 def auth_handler():
     """Auth handler function"""
-    if not require_auth(
-        request.path,
-        app.config["UNPROTECTED_ROUTES"],
-    ):
+    if unprotected_routes.matches(request.path):
         return
     if auth is None or (
         auth.authorization_header(request) is None
@@ -83,6 +115,12 @@ def not_found(error) -> str:
     return jsonify({"error": _("not_found", data="user")}), 404
 
 
+@app.errorhandler(HasherBusy)
+def busy(error) -> str:
+    """Password hashing queue full handler"""
+    return jsonify({"error": _("busy")}), 503, {"Retry-After": str(error.retry_after)}
+
+
 @app.errorhandler(500)
 def not_found(error) -> str:
     """Server error handler"""
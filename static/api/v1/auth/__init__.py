@@ -1,39 +1,28 @@
 from api.v1.auth.auth import Auth
 from api.v1.auth.basic_auth import BasicAuth
 from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.token_auth import TokenAuth
+
+from api.v1.auth.route_matcher import RouteMatcher
 
 from os import getenv
+from functools import lru_cache
 from typing import List
 
-from werkzeug.routing import Map, Rule
+
+@lru_cache(maxsize=8)
+def route_matcher(excluded_paths: tuple) -> RouteMatcher:
+    """Compile a list of excluded paths once"""
+    return RouteMatcher(excluded_paths)
 
 
 def require_auth(path: str, excluded_paths: List[str]) -> bool:
-    """Check if a path requires authentication using Werkzeug route matching."""
+    """Check if a path requires authentication, prefer a RouteMatcher
+    compiled at startup in the request path
+    """
     if path is None or excluded_paths is None:
         return True
-
-    # Create a URL map for excluded paths
-    url_map = Map()
-
-    # Normalise path slashes
-    path = path.rstrip('/')
-
-    for ep in excluded_paths:
-        # Replace wildcard '*' with '<path:rest>' to match anything after the base path
-        ep = ep.rstrip('/')
-        if ep.endswith('/*'):
-            ep = ep.rstrip('*') + '<path:rest>'
-        url_map.add(Rule(ep))
-
-    matcher = url_map.bind("", "/")  # Adjust the host/path if necessary
-
-    # Check if the path matches any of the excluded paths
-    try:
-        matcher.match(path)
-        return False  # Path is excluded
-    except Exception:
-        return True  # Path requires authentication
+    return not route_matcher(tuple(excluded_paths)).matches(path)
 
 
 match getenv("AUTH", None):
@@ -41,5 +30,7 @@ match getenv("AUTH", None):
         auth = BasicAuth()
     case "SESSION_AUTH":
         auth = SessionAuth()
+    case "TOKEN_AUTH":
+        auth = TokenAuth()
     case None:
         auth = Auth()
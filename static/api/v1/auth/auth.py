@@ -2,8 +2,12 @@
 """ Module of the Base of Authentication mechanisms
 """
 from os import getenv
+from typing import Callable
 import base64
 
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 from models import storage
 from models.user import User
 from models.user_session import UserSession
@@ -24,8 +28,34 @@ class Auth:
         """Get the current user"""
         return None
 
+    def cache_stats(self) -> dict:
+        """Hit and miss counters of the caches of the auth manager"""
+        return {}
+
     def session_cookie(self, request=None):
         """Get the the cookie value of a request"""
         if request is None:
             return None
         return request.cookies.get(getenv("SESSION_NAME", "session_id"))
+
+
+def on_user_change(forget: Callable[[int, bool], None]):
+    """Call forget(user id, deleted) whenever this process updates or deletes a
+    user, with a user id of None when a statement may have changed any of them"""
+    event.listen(User, "after_update", lambda mapper, connection, user: forget(user.id, False))
+    event.listen(User, "after_delete", lambda mapper, connection, user: forget(user.id, True))
+
+    def statement_changed(state):
+        """the bulk updates and deletes do not go through the mapper events"""
+        if not (state.is_update or state.is_delete) or state.bind_mapper is None:
+            return
+        if state.bind_mapper.class_ is not User:
+            return
+        if isinstance(state.parameters, list):
+            # storage.bulk_update, by primary key
+            for row in state.parameters:
+                forget(row["id"], state.is_delete)
+        else:
+            forget(None, state.is_delete)
+
+    event.listen(Session, "do_orm_execute", statement_changed)
@@ -1,9 +1,14 @@
 from typing import Tuple
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, on_user_change
+from models.engine.ttl_cache import TTLCache
+from os import getenv
 import base64
+import hashlib
+import hmac
+import secrets
 
-import bcrypt
-
+from api.v1.password_hashing import hasher
+from models.engine.relational_storage import detached_copy
 from models.user import User
 from models import storage
 
@@ -11,6 +16,16 @@ from models import storage
 class BasicAuth(Auth):
     """Basic authentication manager class"""
 
+    # recently verified credentials, keyed by a keyed hash of the header and
+    # mapped to a detached copy of their user. The changes made by this
+    # worker evict them, those of other workers are only seen once they expire
+    credentials = TTLCache(
+        int(getenv("BASIC_AUTH_CACHE_SIZE", 1024)),
+        float(getenv("BASIC_AUTH_CACHE_TTL", 5)),
+    )
+    # never leaves the process, so the cache keys cannot be tested against guesses
+    credentials_secret = secrets.token_bytes(32)
+
     def extract_auth_header(self, auth_header: str) -> str:
         """Get the auth header base64 encoded part"""
         if auth_header is None:
@@ -55,10 +70,29 @@ class BasicAuth(Auth):
 
         if user is None:
             return None
-        if not bcrypt.checkpw(password.encode(), user.password):
+        if not hasher.checkpw(password, user.password):
             return None
         return user
 
+    def credentials_key(self, header_data: str) -> bytes:
+        """Keyed hash of the decoded auth header"""
+        return hmac.new(self.credentials_secret, header_data.encode(), hashlib.sha256).digest()
+
+    def cached_user(self, key: bytes) -> User:
+        """Get the user of credentials verified recently, attached without a query"""
+        return storage.attach(self.credentials.get(key))
+
+    @classmethod
+    def forget_user(cls, user_id: int, deleted: bool = False) -> int:
+        """Forget the verified credentials of a user that changed, or of every user"""
+        if user_id is None:
+            return cls.credentials.clear()
+        return cls.credentials.discard_where(lambda user: user.id == user_id)
+
+    def cache_stats(self) -> dict:
+        """Hit and miss counters of the verified credentials cache"""
+        return self.credentials.stats()
+
     def current_user(self, request) -> User:
         """Get the current user authorized for a request"""
         if request is None:
@@ -66,6 +100,18 @@ class BasicAuth(Auth):
         auth_header = self.authorization_header(request)
         b64_header = self.extract_auth_header(auth_header)
         header_data = self.decode_header(b64_header)
+        if header_data is None:
+            return None
+        key = self.credentials_key(header_data)
+        user = self.cached_user(key)
+        if user is not None:
+            return user
         user_email, user_pwd = self.extract_user_credentials(header_data)
         user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            self.credentials.set(key, detached_copy(user))
         return user
+
+
+# a new password or a deactivation must not keep the old credentials valid
+on_user_change(BasicAuth.forget_user)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Module of the matcher of the routes that need no authentication
+"""
+import re
+from typing import List
+
+from werkzeug.routing import Map, Rule
+from werkzeug.exceptions import HTTPException
+
+# regular expressions of the werkzeug converters that take no arguments
+CONVERTERS = {
+    "default": r"[^/]+",
+    "string": r"[^/]+",
+    "int": r"\d+",
+    "path": r"[^/].*?",
+}
+ARGUMENT = re.compile(r"<(?:([a-zA-Z_][a-zA-Z0-9_]*):)?([a-zA-Z_][a-zA-Z0-9_]*)>")
+
+
+def normalise(pattern: str) -> str:
+    """Strip the trailing slash and turn a trailing '/*' into a path argument"""
+    pattern = pattern.rstrip('/')
+    if pattern.endswith('/*'):
+        pattern = pattern.rstrip('*') + '<path:rest>'
+    return pattern
+
+
+def pattern_regex(pattern: str) -> str:
+    """Translate a URL rule into a regular expression, None if it uses other converters"""
+    regex = []
+    end = 0
+    for argument in ARGUMENT.finditer(pattern):
+        converter = CONVERTERS.get(argument.group(1) or "default")
+        if converter is None:
+            return None
+        regex.append(re.escape(pattern[end:argument.start()]))
+        regex.append(converter)
+        end = argument.end()
+    if '<' in pattern[end:]:
+        return None
+    regex.append(re.escape(pattern[end:]))
+    return "".join(regex)
+
+
+class RouteMatcher:
+    """The URL patterns of a list of routes compiled once for matching request paths
+
+    Static paths are looked up in a set, the patterns with arguments are joined
+    into a single regular expression and the rare converters werkzeug offers
+    beyond those are left to a werkzeug Map bound once.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.static = set()
+        regexes = []
+        url_map = Map()
+        for pattern in patterns:
+            pattern = normalise(pattern)
+            if '<' not in pattern:
+                self.static.add(pattern)
+                continue
+            regex = pattern_regex(pattern)
+            if regex is None:
+                url_map.add(Rule(pattern))
+            else:
+                regexes.append(regex)
+        self.regex = re.compile("|".join(f"(?:{regex})" for regex in regexes)) if regexes else None
+        self.adapter = url_map.bind("", "/") if list(url_map.iter_rules()) else None
+
+    def matches(self, path: str) -> bool:
+        """Check if a path matches one of the patterns"""
+        path = path.rstrip('/')
+        if path in self.static:
+            return True
+        if self.regex is not None and self.regex.fullmatch(path):
+            return True
+        if self.adapter is not None:
+            try:
+                self.adapter.match(path)
+                return True
+            except HTTPException:
+                return False
+        return False
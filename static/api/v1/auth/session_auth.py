@@ -1,10 +1,15 @@
 from datetime import timedelta, datetime
 from os import getenv
+from typing import Tuple
+import time
 import uuid
 
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, on_user_change
+from api.v1.auth.session_store import SharedSessionStore
+from models.engine.ttl_cache import TTLCache
 from models.user import User
 from models.user_session import UserSession
+from models.engine.relational_storage import detached_copy
 from models import storage
 
 
@@ -13,39 +18,136 @@ class SessionAuth(Auth):
 
     session_duration = int(getenv("SESSION_DURATION", 86400))
 
+    # SESSION_CACHE=SHARED keeps the sessions in a local file read by every
+    # worker of the host, so that a logout is seen by all of them at once
+    shared = (
+        SharedSessionStore(getenv("SESSION_CACHE_PATH", "sessions.db"))
+        if getenv("SESSION_CACHE") == "SHARED"
+        else None
+    )
+    # session cookie -> (user id, expiry date), and user id -> (detached copy
+    # of the user, time it was cached), held by the worker. Without the shared
+    # store the logouts and user changes of other workers are only seen once
+    # an entry expires, so they are only kept a few seconds by default
+    cache_ttl = float(getenv("SESSION_CACHE_TTL", 300 if shared is not None else 5))
+    sessions = TTLCache(int(getenv("SESSION_CACHE_SIZE", 4096)), cache_ttl)
+    users = TTLCache(int(getenv("SESSION_CACHE_SIZE", 4096)), cache_ttl)
+
     def create_session(self, user_id: str = None) -> str:
         """Create a session id associated with a user id"""
         if user_id is None:
             return None
         session_id = uuid.uuid4()
+        expiry_date = datetime.now() + timedelta(seconds=self.session_duration)
 
         storage.new(
             UserSession(
-                expiry_date=(datetime.now() + timedelta(seconds=self.session_duration)),
+                expiry_date=expiry_date,
                 uuid=session_id,
                 user_id=user_id,
             )
         )
         storage.save()
+        self.remember_session(str(session_id), user_id, expiry_date)
         return str(session_id)
 
-    def current_user(self, request) -> User:
-        """Get the current user"""
-        session_cookie = self.session_cookie(request)
-        if session_cookie is None:
+    def parse_session_id(self, session_cookie: str) -> uuid.UUID:
+        """Get the session uuid of a cookie, None if it is not one"""
+        try:
+            return uuid.UUID(session_cookie)
+        except ValueError:
+            return None
+
+    def remember_session(self, session_cookie: str, user_id: int, expiry_date: datetime):
+        """Cache a session until it expires"""
+        if self.shared is not None:
+            self.shared.put_session(session_cookie, user_id, expiry_date)
+            return
+        ttl = min(self.sessions.ttl, (expiry_date - datetime.now()).total_seconds())
+        if ttl > 0:
+            self.sessions.set(session_cookie, (user_id, expiry_date), ttl)
+
+    def forget_session(self, session_cookie: str):
+        """Evict a session from the cache"""
+        self.sessions.pop(session_cookie)
+        if self.shared is not None:
+            self.shared.delete_session(session_cookie)
+
+    def lookup_session(self, session_cookie: str) -> Tuple[int, datetime]:
+        """Get the user id and expiry date of a session, from the cache when possible"""
+        if self.shared is not None:
+            cached = self.shared.get_session(session_cookie)
+        else:
+            cached = self.sessions.get(session_cookie)
+        if cached is not None:
+            return cached
+        session_id = self.parse_session_id(session_cookie)
+        if session_id is None:
             return None
-        session_cookie = uuid.UUID(f'{{{session_cookie}}}')
         session = (
             storage.query(UserSession)
-            .where(UserSession.uuid == session_cookie)
+            .where(UserSession.uuid == session_id)
             .one_or_none()
         )
         if session is None:
             return None
         if session.expiry_date <= datetime.now():
-            storage.delete(session)
+            # removed by the session sweeper
+            return None
+        self.remember_session(session_cookie, session.user_id, session.expiry_date)
+        return session.user_id, session.expiry_date
+
+    def load_user(self, user_id: int) -> User:
+        """Get a user, attached from the cache when it is unchanged"""
+        cached = self.users.get(user_id)
+        if cached is not None:
+            user, cached_at = cached
+            if self.shared is None or not self.shared.changed_since(user_id, cached_at):
+                return storage.attach(user)
+            self.users.pop(user_id)
+        cached_at = time.time()
+        user = storage.query(User).where(User.id == user_id).one_or_none()
+        if user is not None:
+            self.users.set(user_id, (detached_copy(user), cached_at))
+        return user
+
+    @classmethod
+    def forget_user(cls, user_id: int, deleted: bool = False):
+        """Evict a user that changed, and its sessions if it was deleted, or
+        every user when the user id is None"""
+        if user_id is None:
+            cls.users.clear()
+            if deleted:
+                cls.sessions.clear()
+            if cls.shared is not None:
+                cls.shared.all_users_changed()
+            return
+        cls.users.pop(user_id)
+        if deleted:
+            cls.sessions.discard_where(lambda cached: cached[0] == user_id)
+        if cls.shared is not None:
+            cls.shared.user_changed(user_id)
+
+    def cache_stats(self) -> dict:
+        """Hit and miss counters of the session and user caches"""
+        return {"sessions": self.sessions.stats(), "users": self.users.stats()}
+
+    def current_user(self, request) -> User:
+        """Get the current user"""
+        session_cookie = self.session_cookie(request)
+        if session_cookie is None:
             return None
-        user = storage.query(User).where(User.id == session.user_id).one_or_none()
+        session = self.lookup_session(session_cookie)
+        if session is None:
+            return None
+        user_id, expiry_date = session
+        if expiry_date <= datetime.now():
+            self.forget_session(session_cookie)
+            return None
+        user = self.load_user(user_id)
+        if user is None:
+            # deleted since the session was cached
+            self.forget_session(session_cookie)
         return user
 
     def destroy_session(self, request) -> bool:
@@ -60,11 +162,20 @@ class SessionAuth(Auth):
         if session_cookie is None:
             return False
 
-        session_cookie = uuid.UUID(f'{{{session_cookie}}}')
+        self.forget_session(session_cookie)
+        session_id = self.parse_session_id(session_cookie)
+        if session_id is None:
+            return False
+        self.forget_session(str(session_id))
         user_session = (
-            storage.query(UserSession).where(UserSession.uuid==session_cookie).one_or_none()
+            storage.query(UserSession).where(UserSession.uuid==session_id).one_or_none()
         )
         if user_session is None:
             return False
         storage.delete(user_session)
         return True
+
+
+# the cached copies must not outlive a change to their row, other workers
+# learn of it through the shared store
+on_user_change(SessionAuth.forget_user)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+""" Module of the session store shared by the workers of a host
+"""
+import sqlite3
+import time
+from datetime import datetime
+from threading import local
+from typing import Tuple
+
+# the user id the changes of a statement that may have touched any user are recorded under
+ALL_USERS = 0
+
+
+class SharedSessionStore:
+    """Sessions, revoked tokens and user changes kept in a local SQLite file,
+    so that every worker process sees the logins, logouts and user updates of
+    the others without a round trip to the application database
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = local()
+        with self.connection() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions"
+                " (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, expiry REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expiry)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS user_changes"
+                " (user_id INTEGER PRIMARY KEY, changed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_tokens"
+                " (id TEXT PRIMARY KEY, expiry REAL NOT NULL)"
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        """The connection of the current thread"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return db
+
+    def get_session(self, session_id: str) -> Tuple[int, datetime]:
+        """Get the user id and expiry date of a session"""
+        row = self.connection().execute(
+            "SELECT user_id, expiry FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], datetime.fromtimestamp(row[1])
+
+    def put_session(self, session_id: str, user_id: int, expiry_date: datetime):
+        """Record a session"""
+        self.connection().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, user_id, expiry_date.timestamp()),
+        )
+
+    def delete_session(self, session_id: str):
+        """Forget a session"""
+        self.connection().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def user_changed(self, user_id: int):
+        """Record that a user was updated or deleted"""
+        self.connection().execute(
+            "INSERT OR REPLACE INTO user_changes VALUES (?, ?)", (user_id, time.time())
+        )
+
+    def all_users_changed(self):
+        """Record that any user may have been updated or deleted"""
+        self.user_changed(ALL_USERS)
+
+    def changed_since(self, user_id: int, timestamp: float) -> bool:
+        """Check whether a user changed after a time"""
+        row = self.connection().execute(
+            "SELECT MAX(changed_at) FROM user_changes WHERE user_id IN (?, ?)",
+            (user_id, ALL_USERS),
+        ).fetchone()
+        return row[0] is not None and row[0] >= timestamp
+
+    def revoke_token(self, token_id: str, expiry: float):
+        """Record a token revoked until it expires"""
+        self.connection().execute(
+            "INSERT OR REPLACE INTO revoked_tokens VALUES (?, ?)", (token_id, expiry)
+        )
+
+    def is_revoked(self, token_id: str) -> bool:
+        """Check whether a token was revoked"""
+        return self.connection().execute(
+            "SELECT 1 FROM revoked_tokens WHERE id = ?", (token_id,)
+        ).fetchone() is not None
+
+    def purge_expired(self) -> int:
+        """Remove the expired sessions and revocations, returning how many"""
+        db = self.connection()
+        now = time.time()
+        return (
+            db.execute("DELETE FROM sessions WHERE expiry <= ?", (now,)).rowcount
+            + db.execute("DELETE FROM revoked_tokens WHERE expiry <= ?", (now,)).rowcount
+        )
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Module of the sweeper of the expired user sessions
+
+    python -m api.v1.auth.session_sweeper [--batch-size 1000]
+
+runs a single sweep, for a cron job. The app runs one every
+SESSION_SWEEP_INTERVAL seconds in a background thread, 0 disables it.
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+from os import getenv
+from threading import Event, Thread
+
+from sqlalchemy import delete, select
+
+from api.v1.auth.session_auth import SessionAuth
+from models import storage
+from models.user_session import UserSession
+
+
+def sweep_expired_sessions(batch_size: int = 1000, now: datetime = None) -> int:
+    """Delete the expired sessions in batches of batch_size, oldest first,
+    committing each batch, and return how many were deleted"""
+    if now is None:
+        now = datetime.now()
+    removed = 0
+    with storage.independent_session() as session:
+        while True:
+            ids = session.scalars(
+                select(UserSession.id)
+                .where(UserSession.expiry_date <= now)
+                .order_by(UserSession.expiry_date)
+                .limit(batch_size)
+            ).all()
+            if ids:
+                session.execute(delete(UserSession).where(UserSession.id.in_(ids)))
+                session.commit()
+                removed += len(ids)
+            if len(ids) < batch_size:
+                break
+    if SessionAuth.shared is not None:
+        SessionAuth.shared.purge_expired()
+    return removed
+
+
+class SessionSweeper(Thread):
+    """Background thread sweeping the expired sessions periodically"""
+
+    def __init__(self, interval: float, batch_size: int = 1000):
+        super().__init__(name="session-sweeper", daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = Event()
+
+    def run(self):
+        """Sweep every interval seconds until stopped"""
+        while not self.stopped.wait(self.interval):
+            try:
+                sweep_expired_sessions(self.batch_size)
+            except Exception as e:
+                print(f"[{e.__class__.__name__}]: {e}")
+
+    def stop(self):
+        """Stop sweeping"""
+        self.stopped.set()
+
+
+def start_session_sweeper() -> SessionSweeper:
+    """Start the sweeper configured by the environment, None if it is disabled"""
+    interval = float(getenv("SESSION_SWEEP_INTERVAL", 3600))
+    if interval <= 0:
+        return None
+    sweeper = SessionSweeper(interval, int(getenv("SESSION_SWEEP_BATCH", 1000)))
+    sweeper.start()
+    return sweeper
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Delete the expired user sessions")
+    parser.add_argument("--batch-size", type=int, default=int(getenv("SESSION_SWEEP_BATCH", 1000)))
+    args = parser.parse_args()
+    print(f"{sweep_expired_sessions(args.batch_size)} expired sessions deleted")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+""" Module of the signed token authentication
+"""
+from os import getenv
+from threading import Lock
+from typing import Tuple
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+
+from api.v1.auth.session_auth import SessionAuth
+from models.user import User
+
+
+class TokenAuth(SessionAuth):
+    """Signed token authentication manager class
+
+    A token is '<user id>.<expiry timestamp>.<nonce>.<signature>', signed with
+    HMAC-SHA256 under TOKEN_SECRET. It is handed out in place of a session id,
+    so the session cookie carries it, and an 'Authorization: Bearer' header
+    is accepted too. Verifying one needs no storage, only the revocation list
+    of the tokens logged out before they expired.
+
+    Every worker must be given the same TOKEN_SECRET to accept the tokens of
+    the others, the app does not start without one. The revocation list is
+    kept by each worker unless SESSION_CACHE=SHARED, so with several workers
+    a logout only applies on all of them with the shared store.
+    """
+
+    token_duration = int(getenv("TOKEN_DURATION", getenv("SESSION_DURATION", 86400)))
+    token_secret = getenv("TOKEN_SECRET", "").encode()
+
+    # signature -> expiry timestamp of the revoked tokens, until they expire
+    revoked = {}
+    revoked_lock = Lock()
+
+    def __init__(self):
+        """Refuse to start without a secret, a random one per process would
+        make the workers reject the tokens of each other"""
+        if not self.token_secret:
+            raise RuntimeError("TOKEN_SECRET must be set to use AUTH=TOKEN_AUTH")
+
+    def sign(self, payload: str) -> str:
+        """The urlsafe base64 HMAC-SHA256 signature of a payload"""
+        digest = hmac.new(self.token_secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def create_session(self, user_id: int = None) -> str:
+        """Create a signed token for a user id"""
+        if user_id is None:
+            return None
+        expiry = int(time.time()) + self.token_duration
+        payload = f"{user_id}.{expiry}.{secrets.token_urlsafe(6)}"
+        return f"{payload}.{self.sign(payload)}"
+
+    def request_token(self, request) -> str:
+        """Get the token of a request, from the bearer header or the session cookie"""
+        auth_header = self.authorization_header(request)
+        if auth_header is not None and auth_header[:7] == "Bearer ":
+            return auth_header[7:]
+        return self.session_cookie(request)
+
+    def verify_token(self, token: str) -> Tuple[int, int, str]:
+        """Get the user id, expiry and signature of a valid token, None otherwise"""
+        if type(token) is not str:
+            return None
+        payload, _, signature = token.rpartition(".")
+        if not payload or not hmac.compare_digest(signature.encode(), self.sign(payload).encode()):
+            return None
+        user_id, expiry, _ = payload.split(".")
+        user_id, expiry = int(user_id), int(expiry)
+        if expiry <= time.time() or self.is_revoked(signature):
+            return None
+        return user_id, expiry, signature
+
+    def is_revoked(self, signature: str) -> bool:
+        """Check whether a token was logged out"""
+        if signature in self.revoked:
+            return True
+        return self.shared is not None and self.shared.is_revoked(signature)
+
+    def revoke(self, signature: str, expiry: int):
+        """Reject a token until it expires"""
+        now = time.time()
+        with self.revoked_lock:
+            expired = [key for key, until in self.revoked.items() if until <= now]
+            for key in expired:
+                del self.revoked[key]
+            self.revoked[signature] = expiry
+        if self.shared is not None:
+            self.shared.revoke_token(signature, expiry)
+
+    def cache_stats(self) -> dict:
+        """Hit and miss counters of the user cache and size of the revocation list"""
+        return {"users": self.users.stats(), "revoked": len(self.revoked)}
+
+    def current_user(self, request) -> User:
+        """Get the user of the token of a request"""
+        if request is None:
+            return None
+        claims = self.verify_token(self.request_token(request))
+        if claims is None:
+            return None
+        return self.load_user(claims[0])
+
+    def destroy_session(self, request) -> bool:
+        """revoke the token of a request/log out the current user
+        Return:
+            - on success: True
+            - on error: False
+        """
+        if request is None:
+            return False
+        claims = self.verify_token(self.request_token(request))
+        if claims is None:
+            return False
+        _, expiry, signature = claims
+        self.revoke(signature, expiry)
+        return True
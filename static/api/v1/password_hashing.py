@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+""" Module of the password hashing service
+
+bcrypt runs in a dedicated pool of processes so that a burst of logins
+cannot hold every request thread, and the requests beyond its queue are
+turned away with a 503. The module imports nothing of the app, the pool
+workers import it to run the hashing functions.
+"""
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from os import getenv
+from threading import Lock
+
+import bcrypt
+
+
+def hash_password(password: bytes, submitted: float):
+    """Hash a password in a worker, with the time it waited and took"""
+    started = time.time()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt())
+    return hashed, started - submitted, time.time() - started
+
+
+def check_password(password: bytes, hashed: bytes, submitted: float):
+    """Check a password in a worker, with the time it waited and took"""
+    started = time.time()
+    matches = bcrypt.checkpw(password, hashed)
+    return matches, started - submitted, time.time() - started
+
+
+class HasherBusy(Exception):
+    """The queue of the password hasher is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"password hasher busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """bcrypt in a bounded pool of worker processes"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, timeout: float = 10):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self.hashes = 0
+        self.rejected = 0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.hash_time = 0.0
+        self.max_hash_time = 0.0
+        self._pool = None
+        self._lock = Lock()
+
+    def pool(self) -> ProcessPoolExecutor:
+        """The worker processes, forked by start or else with the first hash"""
+        with self._lock:
+            if self._pool is None:
+                method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def start(self):
+        """Fork the worker processes now, before the app starts its sweeper
+        and request threads, whose locks a worker forked later would inherit
+        in whatever state they are"""
+        self.pool().submit(int).result()
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained"""
+        average = self.hash_time / self.hashes if self.hashes else 0.25
+        return max(1, math.ceil(average * self.pending / self.workers))
+
+    def done(self, future):
+        """Account for a finished hash"""
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            _, waited, took = future.result()
+            self.hashes += 1
+            self.queue_wait += waited
+            self.max_queue_wait = max(self.max_queue_wait, waited)
+            self.hash_time += took
+            self.max_hash_time = max(self.max_hash_time, took)
+
+    def run(self, func, *args):
+        """Run a hashing function in the pool, raise HasherBusy if the queue is full"""
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy(self.retry_after())
+            self.pending += 1
+        try:
+            future = self.pool().submit(func, *args, time.time())
+        except BrokenProcessPool:
+            with self._lock:
+                self.pending -= 1
+                self._pool = None
+            raise
+        future.add_done_callback(self.done)
+        try:
+            return future.result(self.timeout)[0]
+        except TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy(self.retry_after())
+
+    def hashpw(self, password: str) -> bytes:
+        """Hash a password with a new salt"""
+        return self.run(hash_password, password.encode())
+
+    def checkpw(self, password: str, hashed: bytes) -> bool:
+        """Check a password against its hash"""
+        return self.run(check_password, password.encode(), hashed)
+
+    def stats(self) -> dict:
+        """Queue depth, counters and times of the password hasher"""
+        hashes = self.hashes or 1
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            "hashes": self.hashes,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self.queue_wait / hashes * 1000, 3),
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+            "avg_hash_ms": round(self.hash_time / hashes * 1000, 3),
+            "max_hash_ms": round(self.max_hash_time * 1000, 3),
+        }
+
+
+hasher = PasswordHasher(
+    int(getenv("PASSWORD_HASH_WORKERS", 2)),
+    int(getenv("PASSWORD_HASH_QUEUE", 16)),
+    float(getenv("PASSWORD_HASH_TIMEOUT", 10)),
+)
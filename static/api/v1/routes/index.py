@@ -22,7 +22,7 @@ def stats() -> str:
       - on success: the number of each objects
       - on error:
     """
-    from models import classes, storage, User
+    from models import table_stats
     from flask import g
     from flask_babel import _
 
@@ -30,7 +30,33 @@ def stats() -> str:
     if user is None:
         return jsonify(_("unauthorized"))
 
-    stats = {}
-    for clsname, cls in classes.items():
-        stats[clsname] = storage.query(cls).count()
+    return jsonify(table_stats.counts())
+
+
+@app_routes.route("/stats/ops", strict_slashes=False)
+def ops_stats() -> str:
+    """GET /api/v1/stats/ops
+    Return:
+      - on success: the operational metrics of the worker, for the users
+        named in ADMIN_USERS only
+      - on error: respond with 401 or 403 error codes
+    """
+    from os import getenv
+    from models import storage, table_stats
+    from api.v1.auth import auth
+    from api.v1.password_hashing import hasher
+    from flask import g
+    from flask_babel import _
+
+    user = getattr(g, "user", None)
+    if user is None:
+        return jsonify({"error": _("unauthorized")}), 401
+    if user.user_name not in getenv("ADMIN_USERS", "admin").split(","):
+        return jsonify({"error": _("forbidden")}), 403
+
+    stats = {"table_counts": table_stats.stats()}
+    if auth is not None and auth.cache_stats():
+        stats["auth_cache"] = auth.cache_stats()
+    stats["password_hashing"] = hasher.stats()
+    stats["database_pool"] = storage.pool_stats()
     return jsonify(stats)
@@ -36,7 +36,7 @@ class BaseModel:
         return self
 
     def save(self):
-        """update 'updated_at' and commit changes"""
+        """update 'updated_at' and commit changes, or stage them in a unit of work"""
         from models import storage
 
         storage.new(self)
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+"""CacheStorage class Module
+"""
+from os import getenv
+from typing import NamedTuple
+
+from sqlalchemy import event
+
+from models.base import Base
+from models.engine.relational_storage import detached_copy
+from models.engine.ttl_cache import TTLCache
+
+
+class CachePolicy(NamedTuple):
+    """How many instances and counts of a model to cache, and for how long"""
+    maxsize: int = int(getenv("QQ_CACHE_SIZE", 1024))
+    ttl: float = float(getenv("QQ_CACHE_TTL", 60))
+
+
+class CacheStorage:
+    """read-through cache of the instances by id and of the counts of each
+    model over a backing storage
+
+    The cached instances are detached copies, attached to the backing
+    session on every hit so that the callers get objects they can modify
+    and navigate as usual, or the instance the session already holds. Only
+    committed rows are cached: nothing the current transaction changed is
+    read from or stored in the cache. Inserts, updates and deletes flushed
+    by any session of this process evict what they change, and again when
+    their transaction commits or rolls back, as do the bulk inserts and
+    updates made through this storage. Other processes are only seen once
+    the entries expire.
+
+    The policy of a model comes from the policies given by model class or
+    table name, else from its __cache_policy__ attribute, else the default;
+    a policy of None disables the cache of that model.
+    """
+
+    def __init__(self, backing, policies: dict = None, default: CachePolicy = CachePolicy()):
+        """wrap a backing storage"""
+        self._backing = backing
+        self._policies = {}
+        for model, policy in (policies or {}).items():
+            self._policies[model if isinstance(model, str) else model.__tablename__] = policy
+        self._default = default
+        self._objects = {}
+        self._counts = {}
+        for event_name, evict in (
+            ("after_insert", self._evict_count),
+            ("after_update", self._evict_object),
+            ("after_delete", self._evict_object),
+        ):
+            event.listen(Base, event_name, evict, propagate=True)
+        backing.on_transaction_end(self._evict_writes)
+
+    def __getattr__(self, name):
+        """the rest of the backing storage interface, uncached"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._backing, name)
+
+    def policy(self, cls) -> CachePolicy:
+        """the cache policy of a model"""
+        name = cls.__tablename__
+        if name in self._policies:
+            return self._policies[name]
+        return getattr(cls, "__cache_policy__", self._default)
+
+    def _cache(self, caches: dict, cls) -> TTLCache:
+        """the cache of a model, None if it is not cached"""
+        from models import classes
+
+        if cls not in classes.values():
+            return None
+        name = cls.__tablename__
+        if name not in caches:
+            policy = self.policy(cls)
+            caches[name] = TTLCache(policy.maxsize, policy.ttl) if policy else None
+        return caches[name]
+
+    def _evict_object(self, mapper, connection, obj):
+        """forget an instance and the counts of its model"""
+        self._evict(obj.__tablename__, obj.id)
+
+    def _evict(self, name: str, id):
+        """forget a row of a table, all of them when the id is None, and the
+        counts of the table"""
+        objects = self._objects.get(name)
+        if objects is not None:
+            if id is None:
+                objects.clear()
+            else:
+                objects.pop(id)
+        counts = self._counts.get(name)
+        if counts is not None:
+            counts.clear()
+
+    def _evict_writes(self, writes: set):
+        """forget the rows a transaction wrote once it is committed or rolled
+        back, other sessions may have cached them in the meantime"""
+        for name, id in writes:
+            self._evict(name, id)
+
+    def _written(self, name: str, id=None) -> bool:
+        """whether the current transaction changed a row of a table, or any
+        of them when the id is None"""
+        return any(
+            table == name and (id is None or row in (id, None))
+            for table, row in self._backing.uncommitted()
+        )
+
+    def _evict_count(self, mapper, connection, obj):
+        """forget the counts of the model of an instance"""
+        counts = self._counts.get(obj.__tablename__)
+        if counts is not None:
+            counts.clear()
+
+    def new(self, obj):
+        """add the object to the current database session"""
+        return self._backing.new(obj)
+
+    def new_many(self, objs):
+        """add the objects to the current database session"""
+        return self._backing.new_many(objs)
+
+    def bulk_insert(self, cls, rows):
+        """insert rows of a model, forgetting its counts"""
+        counts = self._counts.get(cls.__tablename__)
+        if counts is not None:
+            counts.clear()
+        return self._backing.bulk_insert(cls, rows)
+
+    def bulk_update(self, cls, rows):
+        """update rows of a model by id, forgetting them"""
+        objects = self._objects.get(cls.__tablename__)
+        if objects is not None:
+            for row in rows:
+                objects.pop(row["id"])
+        return self._backing.bulk_update(cls, rows)
+
+    def update(self, obj):
+        """merge the object into the current database session"""
+        if obj is not None:
+            self._evict_object(None, None, obj)
+        return self._backing.update(obj)
+
+    def delete(self, obj):
+        """delete from the current database session obj if not None"""
+        if obj is not None:
+            self._evict_object(None, None, obj)
+        return self._backing.delete(obj)
+
+    def save(self):
+        """commit all changes of the current database session"""
+        self._backing.save()
+
+    def get(self, cls, id):
+        """
+        Returns the object based on the class and its ID, from the cache
+        when possible, or None if not found
+        """
+        objects = self._cache(self._objects, cls)
+        if objects is None or self._written(cls.__tablename__, id):
+            return self._backing.get(cls, id)
+        cached = objects.get(id)
+        if cached is not None:
+            return self._backing.attach(cached)
+        obj = self._backing.get(cls, id)
+        if obj is not None and not self._written(cls.__tablename__, id):
+            objects.set(id, detached_copy(obj))
+        return obj
+
+    def search(self, cls, **kwargs):
+        """Search for a matching class instance"""
+        return self._backing.search(cls, **kwargs)
+
+    def count(self, cls=None):
+        """count the number of objects in storage, from the cache when possible"""
+        if not cls:
+            return self._backing.count()
+        counts = self._cache(self._counts, cls)
+        if counts is None or self._written(cls.__tablename__):
+            return self._backing.count(cls)
+        count = counts.get(None)
+        if count is None:
+            count = self._backing.count(cls)
+            if not self._written(cls.__tablename__):
+                counts.set(None, count)
+        return count
+
+    def all(self, cls=None):
+        """query on the current database session"""
+        return self._backing.all(cls)
+
+    def query(self, *args, **kwargs):
+        return self._backing.query(*args, **kwargs)
+
+    def stats(self) -> dict:
+        """hit and miss counters of the caches of each model"""
+        return {
+            name: {
+                kind: caches[name].stats()
+                for kind, caches in (("objects", self._objects), ("counts", self._counts))
+                if caches.get(name) is not None
+            }
+            for name in sorted(self._objects.keys() | self._counts.keys())
+        }
@@ -2,7 +2,7 @@
 """DocumentStorage class Module
 """
 from os import getenv
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 
 classes = {}
 
@@ -27,6 +27,30 @@ class DocumentStorage:
         print(obj)
         self._db[obj.__tablename__].insert_one(obj.json())
 
+    def new_many(self, objs):
+        """Add the objects to the current database, one insert_many per collection."""
+        collections = {}
+        for obj in objs:
+            collections.setdefault(obj.__tablename__, []).append(obj.json())
+        for name, documents in collections.items():
+            self._db[name].insert_many(documents)
+        return objs
+
+    def bulk_insert(self, cls, rows):
+        """Insert documents of a model in a single insert_many."""
+        if rows:
+            self._db[cls.__tablename__].insert_many(rows)
+        return len(rows)
+
+    def bulk_update(self, cls, rows):
+        """Update documents of a model by their id in a single bulk_write."""
+        if rows:
+            self._db[cls.__tablename__].bulk_write([
+                UpdateOne({"_id": row["id"]}, {"$set": {k: v for k, v in row.items() if k != "id"}})
+                for row in rows
+            ])
+        return len(rows)
+
     def update(self, obj):
         """Update the object in the database."""
         self._db[obj.__tablename__].update_one({"_id": obj.id}, {"$set": obj.json()})
@@ -40,6 +64,18 @@ class DocumentStorage:
         """Placeholder for save (MongoDB auto-commits)."""
         pass
 
+    def flush(self):
+        """Placeholder for flush (MongoDB auto-commits)."""
+        pass
+
+    def begin_unit_of_work(self):
+        """Placeholder for begin_unit_of_work (MongoDB auto-commits)."""
+        pass
+
+    def end_unit_of_work(self, commit=True):
+        """Placeholder for end_unit_of_work (MongoDB auto-commits)."""
+        pass
+
     def reload(self):
         """Reloads data from the database."""
         pass
@@ -74,6 +110,14 @@ class DocumentStorage:
             count = self._db[cls.__tablename__].estimated_document_count()
         return count
 
+    def table_counts(self, approximate: bool = False) -> dict:
+        """the number of documents of the collection of every class"""
+        return {
+            name: self._db[clas.__tablename__].estimated_document_count()
+            if approximate else self._db[clas.__tablename__].count_documents({})
+            for name, clas in classes.items()
+        }
+
     def all(self, cls=None):
         """Query all objects in the current database."""
         new_dict = {}
@@ -91,6 +135,21 @@ class DocumentStorage:
         return new_dict
 
 
+    def iter_all(self, cls=None, columns=None, chunk_size=1000):
+        """Stream the documents of a class, or of every class, fetched
+        chunk_size at a time, with only the given columns of a class if any,
+        raise ValueError('columns') if they are given without a class."""
+        if columns and cls is None:
+            raise ValueError('columns')
+        return self._iter_all(cls, columns, chunk_size)
+
+    def _iter_all(self, cls, columns, chunk_size):
+        """The documents of iter_all"""
+        projection = dict.fromkeys(columns, 1) if columns else None
+        for clas in classes.values() if cls is None else [cls]:
+            yield from self._db[clas.__tablename__].find({}, projection, batch_size=chunk_size)
+
+
 # Example usage
 if __name__ == "__main__":
     db = DocumentStorage()
@@ -3,10 +3,30 @@
 """
 from os import getenv
 from collections.abc import Callable
+from itertools import chain
+from datetime import date, datetime
 from typing import Any
+import base64
+import binascii
+import json
 import sqlalchemy as sa
 from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker, Query
+from sqlalchemy.orm import scoped_session, sessionmaker, Query, Session
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm import immediateload, joinedload, selectinload, subqueryload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models.engine.ttl_cache import TTLCache
+
+try:
+    # the main greenlet of each thread is distinct, so this scopes by thread and by greenlet
+    from greenlet import getcurrent as current_scope
+except ImportError:
+    current_scope = None
+
+COUNT_STRATEGIES = ("exact", "cached", "estimated")
+LOADERS = {"selectin": selectinload, "joined": joinedload, "subquery": subqueryload, "immediate": immediateload}
+count_cache = TTLCache(int(getenv("QQ_COUNT_CACHE_SIZE", 1024)), float(getenv("QQ_COUNT_CACHE_TTL", 30)))
 
 
 class RelationalStorage:
@@ -17,18 +37,28 @@ class RelationalStorage:
 
     def __init__(self):
         """initialise the storage engine instance"""
-        if getenv("QQ_DB_ENGINE", "SQLITE") == "MYSQL":
+        self._transaction_listeners = []
+        mysql = getenv("QQ_DB_ENGINE", "SQLITE") == "MYSQL"
+        # MySQL drops connections idle for longer than its wait_timeout
+        pool = {
+            "pool_size": int(getenv("QQ_DB_POOL_SIZE", 5)),
+            "max_overflow": int(getenv("QQ_DB_MAX_OVERFLOW", 10)),
+            "pool_timeout": float(getenv("QQ_DB_POOL_TIMEOUT", 30)),
+            "pool_recycle": int(getenv("QQ_DB_POOL_RECYCLE", 3600 if mysql else -1)),
+            "pool_pre_ping": getenv("QQ_DB_POOL_PRE_PING", "1" if mysql else "0") == "1",
+        }
+        if mysql:
             DB_NAME = getenv("QQ_DB_NAME", "quizquickie_db")
             DB_USR = getenv("QQ_DB_USR", "quizquickie_usr")
             DB_PWD = getenv("QQ_DB_PWD", "quizquickie_pwd")
             DB_HOST = getenv("QQ_DB_HOST", "localhost")
 
             self._engine = create_engine(
-                f"mysql+mysqldb://{DB_USR}:{DB_PWD}@{DB_HOST}/{DB_NAME}"
+                f"mysql+mysqldb://{DB_USR}:{DB_PWD}@{DB_HOST}/{DB_NAME}", **pool
             )
         else:
             DB = getenv("QQ_DB", "quizquickie_db")
-            self._engine = create_engine(f"sqlite:///{DB}.db")
+            self._engine = create_engine(f"sqlite:///{DB}.db", **pool)
 
     def new(self, obj):
         """add the object to the current database session"""
@@ -36,11 +66,66 @@ class RelationalStorage:
             self._session.add(obj)
         return obj
 
+    def new_many(self, objs):
+        """add the objects to the current database session, they are
+        inserted together on the next flush"""
+        self._session.add_all(objs)
+        return objs
+
+    def bulk_insert(self, cls, rows):
+        """insert rows of column values of a model in a single executemany,
+        without creating the instances"""
+        if rows:
+            self._session.execute(sa.insert(cls), rows)
+        return len(rows)
+
+    def bulk_update(self, cls, rows):
+        """update rows of column values of a model by their id in a single
+        executemany, without loading the instances"""
+        if rows:
+            self._session.execute(sa.update(cls), rows)
+        return len(rows)
+
     def update(self, obj):
         if obj is not None:
             self._session.merge(obj)
         return obj
 
+    def attach(self, obj):
+        """add a copy of a detached, unmodified object to the current
+        database session without reloading it from the database, the
+        instance the session already holds if any, changes included"""
+        if obj is None:
+            return None
+        held = self._session.identity_map.get(sa.inspect(obj).key)
+        if held is not None:
+            return held
+        return self._session.merge(obj, load=False)
+
+    def on_transaction_end(self, callback: Callable[[set], Any]):
+        """call back with the (table name, id) of the rows a transaction wrote
+        once it is committed or rolled back"""
+        self._transaction_listeners.append(callback)
+
+    def _end_transaction(self, session: Session, transaction):
+        """stop recording the writes of a transaction and pass them on"""
+        if transaction.parent is not None:
+            return
+        writes = session.info.pop("writes", set())
+        for callback in self._transaction_listeners:
+            callback(writes)
+
+    def uncommitted(self) -> set:
+        """the (table name, id) of the rows the current transaction changed
+        or is about to flush, without committing them yet, with an id of None
+        for the rows of a statement or of objects not flushed yet"""
+        writes = set(self._session.info.get("writes", ()))
+        writes.update(
+            (obj.__tablename__, obj.id)
+            for obj in chain(self._session.new, self._session.dirty, self._session.deleted)
+        )
+        return writes
+
     def delete(self, obj):
         """delete from the current database session obj if not None"""
         if obj is not None:
@@ -48,25 +133,76 @@ class RelationalStorage:
         return obj
 
     def save(self):
-        """commit all changes of the current database session"""
+        """commit all changes of the current database session, in a unit of
+        work they stay staged until it ends"""
+        if self._session.info.get("unit_of_work"):
+            return
         self._session.commit()
 
+    def begin_unit_of_work(self):
+        """defer the commits of the current thread or greenlet to
+        end_unit_of_work, flush when an id is needed before then"""
+        self._session.info["unit_of_work"] = True
+
+    def end_unit_of_work(self, commit: bool = True):
+        """commit the changes staged since begin_unit_of_work in a single
+        flush, or roll them back"""
+        if not self._session.info.pop("unit_of_work", False):
+            return
+        if not commit:
+            self._session.rollback()
+            return
+        try:
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+
+    def flush(self):
+        """send the changes of the current database session to the database
+        without committing them, assigning the ids of the new objects"""
+        self._session.flush()
+
     def cleanup(self):
         """rollback the changes that happened in the transaction"""
         self._session.rollback()
 
     def reload(self):
-        """reloads data from the database"""
+        """reloads data from the database
+
+        _session is a registry of sessions, each thread or greenlet works in
+        its own one, created when first used
+        """
         from models.base import Base
 
         Base.metadata.create_all(self._engine)
         session_factory = sessionmaker(bind=self._engine, expire_on_commit=False)
-        Session = scoped_session(session_factory)
-        self._session = Session()
+        for event_name, track in (
+            ("after_flush", track_flush),
+            ("do_orm_execute", track_statement),
+            ("after_transaction_end", self._end_transaction),
+        ):
+            sa.event.listen(session_factory, event_name, track)
+        self._session = scoped_session(session_factory, scopefunc=current_scope)
 
     def close(self):
-        """remove the session from the running storage engine"""
-        self._session.close()
+        """close the session of the current thread or greenlet and return its
+        connection to the pool, the next use starts a new session"""
+        self._session.remove()
+
+    def pool_stats(self) -> dict:
+        """connections of the pool in use and idle"""
+        pool = self._engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        }
+
+    def independent_session(self) -> Session:
+        """a database session of its own, for work outside of the requests"""
+        return Session(self._engine, expire_on_commit=False)
 
     def get(self, cls, id):
         """
@@ -77,7 +213,7 @@ class RelationalStorage:
         if cls not in classes.values():
             return None
 
-        return self._session.query(classes[cls]).get(id)
+        return self._session.get(cls, id)
 
     def search(self, cls, **kwargs):
         """Search for a matching class instance"""
@@ -89,11 +225,28 @@ class RelationalStorage:
         count = 0
 
         if not cls:
-            count = sum(self._session.query(clas).count() for clas in classes.values())
+            count = sum(self.table_counts().values())
         elif cls in classes.values():
             count = self._session.query(cls).count()
         return count
 
+    def table_counts(self, approximate: bool = False) -> dict:
+        """the number of rows of the table of every class, counted in a single
+        UNION ALL query, or read from the statistics of the database when
+        approximate, counting only the tables it has none for"""
+        from models import classes
+
+        counts = table_estimates(self._session, list(classes)) if approximate else {}
+        selects = [
+            sa.select(sa.literal(name).label("name"), sa.func.count().label("rows")).select_from(cls.__table__)
+            for name, cls in classes.items()
+            if name not in counts
+        ]
+        if selects:
+            union = sa.union_all(*selects) if len(selects) > 1 else selects[0]
+            counts.update(self._session.execute(union).tuples().all())
+        return {name: counts[name] for name in classes}
+
     def all(self, cls=None):
         """query on the current database session"""
         from models import classes
@@ -106,6 +259,38 @@ class RelationalStorage:
                     new_dict[key] = obj
         return new_dict
 
+    def iter_all(self, cls=None, columns=None, chunk_size: int = 1000):
+        """stream the objects of a class, or of every class, chunk_size rows at
+        a time, or the rows of the named columns of a class if columns is
+        given, raise ValueError('columns') if it is given without a class
+
+        The rows are read with a session of their own, which only keeps the
+        objects the caller holds on to, so that memory use does not grow with
+        the tables. Changes to the objects are not saved. The session is
+        closed once the rows are exhausted, or when the returned generator is
+        closed or garbage collected, so call its close() when stopping early.
+        """
+        if columns and cls is None:
+            raise ValueError('columns')
+        return self._iter_all(cls, columns, chunk_size)
+
+    def _iter_all(self, cls, columns, chunk_size: int):
+        """the rows of iter_all"""
+        from models import classes
+
+        with self.independent_session() as session:
+            for clss in classes:
+                model = classes[clss]
+                if cls is not None and cls is not model and cls is not clss:
+                    continue
+                if columns:
+                    statement = sa.select(*(getattr(model, column) for column in columns))
+                    for chunk in session.execute(statement.execution_options(yield_per=chunk_size)).partitions():
+                        yield from chunk
+                    continue
+                for chunk in session.scalars(sa.select(model).execution_options(yield_per=chunk_size)).partitions():
+                    yield from chunk
+
     def query(self, *args, **kwargs):
         return self._session.query(*args, **kwargs)
 
@@ -145,8 +330,63 @@ if __name__ == "__main__":
         print(db.count(T))
         assert False
 
-def paginate(item_name: str, query: Query, page: int=None, page_size: int=None, apply:Callable[[Any], dict] =None):
-    """Helper function to paginate SQLAlchemy queries"""
+def track_flush(session: Session, flush_context):
+    """record the rows a flush wrote, still listed in the session"""
+    session.info.setdefault("writes", set()).update(
+        (obj.__tablename__, obj.id)
+        for obj in chain(session.new, session.dirty, session.deleted)
+    )
+
+
+def track_statement(state):
+    """record the rows an insert, update or delete statement writes, the
+    bulk writes do not go through the flush"""
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    table = state.bind_mapper.local_table.name
+    writes = state.session.info.setdefault("writes", set())
+    if state.is_update and isinstance(state.parameters, list):
+        # bulk_update, by primary key
+        writes.update((table, row["id"]) for row in state.parameters)
+    else:
+        writes.add((table, None))
+
+
+def detached_copy(obj):
+    """A detached copy of the loaded columns of a model instance, that
+    RelationalStorage.attach adds to later sessions without a query"""
+    mapper = sa.inspect(type(obj))
+    copy = mapper.class_manager.new_instance()
+    for column in mapper.column_attrs:
+        set_committed_value(copy, column.key, getattr(obj, column.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+def preload(cls, paths: dict) -> tuple:
+    """The loader options that load the relationship paths of a model with the
+    query, like {"questions.answers": "selectin"}, for Query.options"""
+    options = []
+    for path, strategy in paths.items():
+        loader = LOADERS[strategy]
+        option, entity = None, cls
+        for name in path.split("."):
+            attribute = getattr(entity, name)
+            option = loader(attribute) if option is None else getattr(option, loader.__name__)(attribute)
+            entity = attribute.property.mapper.class_
+        options.append(option)
+    return tuple(options)
+
+
+def paginate(item_name: str, query: Query, page: int=None, page_size: int=None, apply:Callable[[Any], dict] =None,
+             cursor: bool=False, key=None, descending: bool=False, count: str="exact"):
+    """Helper function to paginate SQLAlchemy queries, with cursor the query is
+    ordered like paginate_cursor orders it and the pages also hold the cursor
+    of their last item, to continue with paginate_cursor
+
+    count is the strategy of count_items for the totals, None leaves them out,
+    the "count" field of the page tells which one was used.
+    """
     if page is None:
         page = 1
     if page_size is None:
@@ -158,16 +398,237 @@ def paginate(item_name: str, query: Query, page: int=None, page_size: int=None,
     if page_size < 1:
         raise ValueError('page_size')
 
-    total_items = query.count()
-    total_pages = (total_items + page_size - 1) // page_size  # Round up to get total pages
-    items = query.limit(page_size).offset((page - 1) * page_size).all()
-
-    return {
+    counted = query
+    if cursor:
+        query, key, id_column, width = cursor_ordered(query, key, descending)
+    offset = (page - 1) * page_size
+    items = query.limit(page_size + 1).offset(offset).all()
+    more = len(items) > page_size
+    items = items[:page_size]
+    if cursor:
+        items, keys = split_cursor_columns(items, width)
+    total_items, count = count_items(counted, count, offset, len(items), more)
+    total_pages = None if total_items is None else (total_items + page_size - 1) // page_size  # Round up to get total pages
+
+    result = {
         item_name: [apply(item) if apply else item.to_dict() for item in items],
         'page': page,
-        'next': page + 1 if page < total_pages else page,
+        'next': page + 1 if more else page,
         'prev': page - 1 if page > 1 else page,
         'page_size': page_size,
         f'total_{item_name}': total_items,
-        'total_pages': total_pages
+        'total_pages': total_pages,
+        'count': count,
+    }
+    if cursor:
+        result['next_cursor'] = encode_cursor(keys[-1], cursor_order(key, descending)) if items and more else None
+    return result
+
+
+def count_strategy(requested: str, strategy: str="exact"):
+    """The count strategy of a request, None when its count parameter is false"""
+    if requested is not None and requested.strip().lower() in ("false", "0", "no", "off"):
+        return None
+    return strategy
+
+
+def count_items(query: Query, strategy: str, offset: int, fetched: int, more: bool):
+    """The total of the items of a query and how it was counted, given the
+    offset and number of items of the fetched page and whether there are items
+    after it
+
+    exact counts the query, cached reuses its count for the same statement and
+    parameters for QQ_COUNT_CACHE_TTL seconds and estimated reads the row count
+    the database keeps for the table, falling back to cached when the query
+    filters, joins or groups the rows. A page that is not past the end and has
+    nothing after it needs no count at all.
+    """
+    if strategy is None:
+        return None, "omitted"
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError('count')
+    seen = offset + fetched
+    if not more and (fetched or not offset):
+        return seen, "exact"
+    # a page with items proves there are at least that many, an estimate or stale count cannot say less
+    least = seen + more if fetched else 0
+    if strategy == "estimated":
+        table = counted_table(query)
+        if table is not None:
+            return max(estimate_rows(query.session, table), least), "estimated"
+        strategy = "cached"
+    if strategy == "exact":
+        return query.count(), "exact"
+    statement = query.enable_eagerloads(False).order_by(None).statement.compile()
+    cache_key = (str(statement), repr(sorted(statement.params.items())))
+    total = count_cache.get(cache_key)
+    if total is None:
+        total = query.count()
+        count_cache.set(cache_key, total)
+    return max(total, least), "cached"
+
+
+def counted_table(query: Query):
+    """The table of a query that selects every one of its rows, None if the
+    query filters, joins, groups or limits them"""
+    statement = query.enable_eagerloads(False).statement
+    froms = statement.get_final_froms()
+    if (
+        len(froms) != 1
+        or not isinstance(froms[0], sa.Table)
+        or statement.whereclause is not None
+        or statement._group_by_clauses
+        or statement._having_criteria
+        or statement._distinct
+        or statement._limit_clause is not None
+        or statement._offset_clause is not None
+    ):
+        return None
+    return froms[0]
+
+
+def table_estimates(session: Session, names: list) -> dict:
+    """The numbers of rows the statistics of the database hold for the named
+    tables, read in a single query, without the tables it has none for
+
+    MySQL keeps an estimate for every table, SQLite only has them after an
+    ANALYZE.
+    """
+    expanding = sa.bindparam("names", expanding=True)
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        rows = session.execute(sa.text(
+            "SELECT table_name, table_rows FROM information_schema.tables"
+            " WHERE table_schema = DATABASE() AND table_name IN :names"
+        ).bindparams(expanding), {"names": list(names)})
+        return {name: count for name, count in rows if count is not None}
+    if dialect == "sqlite" and session.execute(sa.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    )).scalar():
+        # a row per index, each starting with the number of rows of the table
+        rows = session.execute(sa.text(
+            "SELECT tbl, stat FROM sqlite_stat1 WHERE tbl IN :names"
+        ).bindparams(expanding), {"names": list(names)})
+        return {name: int(stat.split()[0]) for name, stat in rows if stat}
+    return {}
+
+
+def estimate_rows(session: Session, table: sa.Table) -> int:
+    """The number of rows of a table according to the statistics of the
+    database, cached like the counts, the largest id stands in for it when
+    there are none
+    """
+    cache_key = ("estimate", table.name)
+    rows = count_cache.get(cache_key)
+    if rows is not None:
+        return rows
+    rows = table_estimates(session, [table.name]).get(table.name)
+    if rows is None:
+        rows = session.execute(sa.select(sa.func.max(table.c.id))).scalar() or 0
+    count_cache.set(cache_key, rows)
+    return rows
+
+
+def cursor_order(key, descending: bool) -> list:
+    """The name and direction of the order of a cursor_ordered query"""
+    return [getattr(key, "key", None) or str(key), "desc" if descending else "asc"]
+
+
+def encode_cursor(values, order: list) -> str:
+    """An opaque token of the sort key and id of an item, and of the order
+    they were read in"""
+    values = [["dt", v.isoformat()] if isinstance(v, datetime) else ["d", v.isoformat()] if isinstance(v, date) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps([*order, *values], separators=(",", ":"), default=str).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: list) -> list:
+    """The sort key and id of a cursor token, raise ValueError('cursor') if it
+    is not one or was read in another order"""
+    try:
+        name, direction, *values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value, id = [
+            datetime.fromisoformat(v[1]) if isinstance(v, list) and v[0] == "dt"
+            else date.fromisoformat(v[1]) if isinstance(v, list) and v[0] == "d"
+            else v
+            for v in values
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, IndexError):
+        raise ValueError('cursor')
+    if [name, direction] != order or not isinstance(id, int):
+        # a key of another column or direction would seek to the wrong page
+        raise ValueError('cursor')
+    return value, id
+
+
+def cursor_ordered(query: Query, key=None, descending: bool=False, reverse: bool=False):
+    """Order a query by a key column then the id of its first entity, adding
+    both as the last columns, and return it with the key, the id column and
+    the number of columns the query had"""
+    id_column = query.column_descriptions[0]["entity"].id
+    key = id_column if key is None else key
+    width = len(query.column_descriptions)
+    backwards = descending != reverse
+    order = [key.desc(), id_column.desc()] if backwards else [key, id_column]
+    query = query.order_by(None).order_by(*(order[1:] if key is id_column else order))
+    return query.add_columns(key.label("cursor_key"), id_column.label("cursor_id")), key, id_column, width
+
+
+def split_cursor_columns(rows: list, width: int):
+    """Separate the items of rows of a cursor_ordered query from their sort key and id"""
+    items = [row[0] if width == 1 else tuple(row[:width]) for row in rows]
+    keys = [(row[-2], row[-1]) for row in rows]
+    return items, keys
+
+
+def seek(key, id_column, value, id, ascending: bool):
+    """The condition selecting the rows after (value, id) in the (key, id) order,
+    or before it when not ascending, NULL keys sort first as in SQLite and MySQL"""
+    beyond = (lambda column, v: column > v) if ascending else (lambda column, v: column < v)
+    if key is id_column:
+        return beyond(id_column, id)
+    if value is None:
+        ties = sa.and_(key.is_(None), beyond(id_column, id))
+        return sa.or_(ties, key.is_not(None)) if ascending else ties
+    after = sa.or_(beyond(key, value), sa.and_(key == value, beyond(id_column, id)))
+    return after if ascending else sa.or_(after, key.is_(None))
+
+
+def paginate_cursor(item_name: str, query: Query, key=None, after: str=None, before: str=None, page_size: int=None,
+                    apply: Callable[[Any], dict]=None, descending: bool=False):
+    """Paginate a SQLAlchemy query by seeking past a cursor instead of counting
+    and skipping rows, so that every page costs the same
+
+    The query is ordered by key, a column that defaults to the id of its first
+    entity, then by that id. after and before are the next_cursor and
+    prev_cursor tokens of a previous page, the first page has neither.
+    """
+    if page_size is None:
+        page_size = getenv("PAGE_SIZE")
+    page_size = int(page_size)
+    if page_size < 1:
+        raise ValueError('page_size')
+    if after is not None and before is not None:
+        raise ValueError('cursor')
+
+    backwards = before is not None
+    query, key, id_column, width = cursor_ordered(query, key, descending, reverse=backwards)
+    cursor = before if backwards else after
+    order = cursor_order(key, descending)
+    if cursor is not None:
+        value, id = decode_cursor(cursor, order)
+        query = query.where(seek(key, id_column, value, id, ascending=descending == backwards))
+    rows = query.limit(page_size + 1).all()
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    items, keys = split_cursor_columns(rows, width)
+
+    has_next = more if not backwards else True
+    has_prev = more if backwards else after is not None
+    return {
+        item_name: [apply(item) if apply else item.to_dict() for item in items],
+        'page_size': page_size,
+        'next_cursor': encode_cursor(keys[-1], order) if items and has_next else None,
+        'prev_cursor': encode_cursor(keys[0], order) if items and has_prev else None,
     }
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+""" Module of the row counts of every table served by the stats endpoint
+"""
+import time
+from threading import Lock, Thread
+
+
+class TableStats:
+    """The row counts of every table of a storage, kept for ttl seconds
+
+    Once they are stale the counts are refreshed by a background thread
+    while the stale ones keep being served, so only the very first call
+    waits on the database.
+    """
+
+    def __init__(self, storage, ttl: float = 10, approximate: bool = False):
+        self.storage = storage
+        self.ttl = ttl
+        self.approximate = approximate
+        self.refreshes = 0
+        self.last_refresh_ms = None
+        self._counts = None
+        self._refreshed_at = 0
+        self._refreshing = False
+        self._lock = Lock()
+
+    def refresh(self) -> dict:
+        """Count the rows of every table now"""
+        started = time.perf_counter()
+        counts = self.storage.table_counts(self.approximate)
+        with self._lock:
+            self._counts = counts
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+            self.last_refresh_ms = round((time.perf_counter() - started) * 1e3, 3)
+        return counts
+
+    def _refresh_in_background(self):
+        """Refresh the counts with a session of the refreshing thread"""
+        try:
+            self.refresh()
+        except Exception as exc:
+            print(f"Error: failed to refresh the table counts: {exc}")
+        finally:
+            self.storage.close()
+            with self._lock:
+                self._refreshing = False
+
+    def counts(self) -> dict:
+        """The row counts of every table, possibly up to a refresh old"""
+        with self._lock:
+            counts = self._counts
+            stale = time.monotonic() - self._refreshed_at >= self.ttl
+            start = counts is not None and stale and not self._refreshing
+            if start:
+                self._refreshing = True
+        if counts is None:
+            return self.refresh()
+        if start:
+            Thread(target=self._refresh_in_background, name="table-stats", daemon=True).start()
+        return counts
+
+    def stats(self) -> dict:
+        """How fresh the counts are and what refreshing them costs"""
+        with self._lock:
+            return {
+                "approximate": self.approximate,
+                "age_s": None if self._counts is None else round(time.monotonic() - self._refreshed_at, 3),
+                "refreshes": self.refreshes,
+                "last_refresh_ms": self.last_refresh_ms,
+            }
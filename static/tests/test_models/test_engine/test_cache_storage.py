@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Check that the CacheStorage never serves uncommitted or reverted rows
+
+    python -m unittest tests.test_models.test_engine.test_cache_storage
+
+The models are loaded with the cache enabled over a throwaway SQLite database.
+"""
+import os
+import tempfile
+import unittest
+
+os.environ.update(QQ_DB_ENGINE="SQLITE", QQ_DB=os.path.join(tempfile.mkdtemp(prefix="test_cache_"), "test"), QQ_CACHE="1")
+
+from models import storage, User
+from models.engine.cache_storage import CacheStorage
+
+
+class TestCacheStorage(unittest.TestCase):
+    """get through a CacheStorage in the middle of a transaction"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.storage = storage if isinstance(storage, CacheStorage) else CacheStorage(storage)
+        cls.User = User
+        cls.user_id = storage.query(User).where(User.user_name == "admin").one().id
+        storage.close()
+
+    def tearDown(self):
+        self.storage.cleanup()
+        user = self.storage.get(self.User, self.user_id)
+        user.user_name = "admin"
+        self.storage.save()
+        self.storage.close()
+
+    def cached_user(self):
+        """the user, after a get that cached it"""
+        self.storage.get(self.User, self.user_id)
+        self.storage.close()
+        return self.storage.get(self.User, self.user_id)
+
+    def test_get_keeps_the_changes_of_the_session(self):
+        """a hit returns the instance the session holds instead of reverting it"""
+        user = self.cached_user()
+        user.user_name = "renamed"
+        self.assertIs(self.storage.get(self.User, self.user_id), user)
+        self.assertEqual(user.user_name, "renamed")
+        self.storage.save()
+        self.storage.close()
+        self.assertEqual(self.storage.get(self.User, self.user_id).user_name, "renamed")
+
+    def test_get_does_not_cache_flushed_changes(self):
+        """a miss in a transaction that flushed a change does not cache it"""
+        self.cached_user().user_name = "uncommitted"
+        self.storage.flush()
+        self.assertEqual(self.storage.get(self.User, self.user_id).user_name, "uncommitted")
+        self.storage.cleanup()
+        self.storage.close()
+        self.assertEqual(self.storage.get(self.User, self.user_id).user_name, "admin")
+        self.storage.close()
+        self.assertEqual(self.storage.get(self.User, self.user_id).user_name, "admin")
+
+    def test_rollback_drops_bulk_updates(self):
+        """the rows of a bulk update rolled back are read again"""
+        self.cached_user()
+        self.storage.bulk_update(self.User, [{"id": self.user_id, "user_name": "bulk"}])
+        self.assertEqual(self.storage.get(self.User, self.user_id).user_name, "bulk")
+        self.storage.cleanup()
+        self.storage.close()
+        self.assertEqual(self.storage.get(self.User, self.user_id).user_name, "admin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""Check the arguments the storages accept
+
+    python -m unittest tests.test_models.test_engine.test_db_storage
+
+The models are loaded over a throwaway SQLite database, and no MongoDB
+server is needed since the client only connects on its first query.
+"""
+import os
+import tempfile
+import unittest
+
+os.environ.update(QQ_DB_ENGINE="SQLITE", QQ_DB=os.path.join(tempfile.mkdtemp(prefix="test_db_"), "test"))
+
+from models import storage, User
+from models.engine.relational_storage import RelationalStorage
+from models.engine.document_storage import DocumentStorage
+
+
+class TestIterAll(unittest.TestCase):
+    """iter_all of each storage"""
+
+    def test_columns_without_class(self):
+        """columns without a class raise ValueError before reading anything"""
+        for storage in RelationalStorage(), DocumentStorage():
+            with self.subTest(storage=type(storage).__name__):
+                with self.assertRaisesRegex(ValueError, "columns"):
+                    storage.iter_all(columns=["id"])
+
+    def test_columns_of_a_class(self):
+        """columns of a class stream their values"""
+        rows = list(storage.iter_all(User, ["user_name"]))
+        self.assertIn(("admin",), [tuple(row) for row in rows])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Check that an incremental build regenerates what a change to the generator affects
+
+    python -m unittest tests.test_incremental
+
+The generator is copied to a temporary directory, built once, then edited
+and built again with --incremental, each build in a new process like the
+command line runs it. The translations and Postman exports are left out.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = ["bbg.py", "engine", "utils", "config", "static"]
+BUILD = """
+import sys
+import bbg
+
+changes = bbg.generate_flask_project("QuizQuickie", incremental=sys.argv[1] == "incremental", workers=1, exports=False)
+print("\\n".join(path for path, _, _ in changes))
+"""
+
+
+class TestIncremental(unittest.TestCase):
+    """incremental builds of a copy of the generator"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="test_incremental_")
+        for source in SOURCES:
+            path = os.path.join(ROOT, source)
+            if os.path.isdir(path):
+                shutil.copytree(path, os.path.join(self.workdir, source), ignore=shutil.ignore_patterns("__pycache__"))
+            else:
+                shutil.copy(path, self.workdir)
+        self.build("full")
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def build(self, mode: str) -> list:
+        """the paths, relative to the project, a build of the copy changed"""
+        result = subprocess.run(
+            [sys.executable, "-c", BUILD, mode], cwd=self.workdir, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        project = os.path.join(self.workdir, "dist", "QuizQuickie")
+        return [os.path.relpath(line, project) for line in result.stdout.splitlines() if line.startswith(project)]
+
+    def edit(self, path: str, old: str, new: str):
+        """replace a string in a file of the copy"""
+        path = os.path.join(self.workdir, path)
+        with open(path) as f:
+            source = f.read()
+        self.assertIn(old, source)
+        with open(path, "w") as f:
+            f.write(source.replace(old, new))
+
+    def test_unchanged(self):
+        """nothing is rewritten when nothing changed"""
+        self.assertEqual(self.build("incremental"), [])
+
+    def test_helper_module_changed(self):
+        """a change to a helper of the emitters regenerates the outputs using it"""
+        self.edit("engine/jsonschemas.py", 'NON_BLANK_REGEX = r"^(?!\\s*$).+"', 'NON_BLANK_REGEX = r"^\\S.*"')
+        changed = self.build("incremental")
+        self.assertTrue(any(path.startswith(os.path.join("api", "v1", "schemas")) for path in changed), changed)
+
+
+if __name__ == "__main__":
+    unittest.main()